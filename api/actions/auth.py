@@ -1,36 +1,218 @@
+from datetime import timedelta
+from logging import getLogger
+from uuid import UUID
+
+from fastapi import BackgroundTasks
 from fastapi import Depends
 from fastapi import HTTPException
 from fastapi import status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
 from jose import JWTError
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession
 from db.dals import UserDAL
 from db.models import User
 import settings
+from cache import TTLCache
+from db.session import async_session
 from db.session import get_db
 from hashing import Hasher
+from hashing import HasherBusyError
+from ratelimit import create_backend
+from ratelimit import LoginRateLimiter
+from revocation import token_revocations
+from security import create_access_token
+from security import create_refresh_token
+from security import decode_access_token
 
+logger = getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/token")
 
 
-async def _get_user_by_email_for_auth(email: str, db) -> User | None:
+class PrincipalCache:
+    """Users resolved from tokens, keyed by user id"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self._users = TTLCache("principal", max_size, ttl)
+
+    def get(self, user_id: UUID) -> User | None:
+        return self._users.get(user_id)
+
+    def set(self, user: User) -> None:
+        self._users.set(user.user_id, user)
+
+    def invalidate(self, user_id: UUID) -> None:
+        self._users.pop(user_id)
+
+    def clear(self) -> None:
+        self._users.clear()
+
+
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_MAX_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+login_rate_limiter = LoginRateLimiter(
+    create_backend(
+        settings.LOGIN_RATE_LIMIT_BACKEND,
+        settings.LOGIN_RATE_LIMIT_REDIS_URL,
+        settings.LOGIN_RATE_LIMIT_MAX_KEYS,
+    ),
+    email_burst=settings.LOGIN_RATE_LIMIT_EMAIL_BURST,
+    email_per_minute=settings.LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE,
+    ip_burst=settings.LOGIN_RATE_LIMIT_IP_BURST,
+    ip_per_minute=settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE,
+)
+
+# login emails that matched no user on the primary, so repeated attempts skip
+# the database
+unknown_emails = TTLCache(
+    "unknown_login_email",
+    settings.LOGIN_UNKNOWN_EMAIL_CACHE_MAX_SIZE,
+    settings.LOGIN_UNKNOWN_EMAIL_TTL_SECONDS,
+)
+_dummy_hash: str | None = None
+
+
+async def _verify_dummy_password(password: str) -> None:
+    """Spend a real verify's bcrypt time so unknown emails cost the same"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await Hasher.get_password_hash_async("dummy password")
+    await Hasher.verify_password_async(password, _dummy_hash)
+
+
+async def _get_user_by_email_for_auth(
+    email: str, db, with_password: bool = False
+) -> User | None:
     async with db as session:
         async with session.begin():
             user_dal = UserDAL(session)
-            return await user_dal.get_user_by_email(email)
+            return await user_dal.get_user_by_email(email, with_password=with_password)
+
+
+async def _get_user_for_auth(user_id: UUID, db) -> User | None:
+    async with db as session:
+        async with session.begin():
+            return await UserDAL(session).get_user(user_id)
 
 
-async def authenticate_user(email: str, password: str, db) -> User | None:
-    user = await _get_user_by_email_for_auth(email, db)
+async def _rehash_password(
+    user_id: UUID, password: str, old_hash: str, session_factory: async_sessionmaker
+) -> None:
+    """Store a hash with the current bcrypt cost; runs after the login response,
+    when the request's session is already closed"""
+    try:
+        new_hash = await Hasher.get_password_hash_async(password)
+    except HasherBusyError:
+        # the hash stays outdated until the next successful login
+        logger.info("Skipped rehash of user %s, hashing pool is busy", user_id)
+        return
+    async with session_factory() as session:
+        async with session.begin():
+            await UserDAL(session).update_password_hash(user_id, old_hash, new_hash)
+
+
+async def authenticate_user(
+    email: str,
+    password: str,
+    db,
+    background_tasks: BackgroundTasks | None = None,
+    session_factory: async_sessionmaker = async_session,
+) -> User | None:
+    user = None
+    if unknown_emails.get(email.lower()) is None:
+        user = await _get_user_by_email_for_auth(email, db, with_password=True)
+        if not user:
+            unknown_emails.set(email.lower(), True)
     if not user:
+        await _verify_dummy_password(password)
         return None
-    if not Hasher.verify_password(password, user.hashed_password):
+    if not await Hasher.verify_password_async(password, user.hashed_password):
         return None
+    if background_tasks is not None and Hasher.needs_update(user.hashed_password):
+        background_tasks.add_task(
+            _rehash_password,
+            user.user_id,
+            password,
+            user.hashed_password,
+            session_factory,
+        )
     return user
 
 
+def issue_tokens(user: User) -> dict:
+    """Access token for ``user``; in stateless mode also a refresh token"""
+    if not settings.AUTH_STATELESS:
+        # user_id lets revoke_subject() reach these tokens too
+        claims = {"sub": user.email, "user_id": str(user.user_id)}
+        return {
+            "access_token": create_access_token(data=claims),
+            "token_type": "bearer",
+        }
+    claims = {
+        "sub": user.email,
+        "user_id": str(user.user_id),
+        "is_active": user.is_active,
+    }
+    access_token = create_access_token(
+        data=claims,
+        expires_delta=timedelta(minutes=settings.STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    refresh_token = create_refresh_token(
+        data={"sub": user.email, "user_id": claims["user_id"]}
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
+async def revoke_tokens(access_token: str, refresh_token: str | None) -> bool:
+    """Revoke the caller's tokens; False if the access token is not valid"""
+    try:
+        payload = decode_access_token(access_token)
+    except JWTError:
+        return False
+    await token_revocations.revoke_token(payload)
+    if refresh_token is not None:
+        try:
+            refresh_payload = decode_access_token(refresh_token)
+        except JWTError:
+            return True
+        # only the caller's own refresh token may be revoked this way
+        if refresh_payload.get("sub") == payload.get("sub"):
+            await token_revocations.revoke_token(refresh_payload)
+    return True
+
+
+def _user_from_claims(payload: dict) -> User:
+    """Transient User built from verified claims, never attached to a session"""
+    return User(
+        user_id=UUID(payload["user_id"]),
+        email=payload["sub"],
+        is_active=payload["is_active"],
+    )
+
+
+async def refresh_user(refresh_token: str, db) -> User | None:
+    """Load the active user a refresh token was issued to"""
+    try:
+        payload = decode_access_token(refresh_token)
+        user_id = UUID(payload["user_id"])
+    except (JWTError, KeyError, ValueError):
+        return None
+    if payload.get("type") != "refresh" or await token_revocations.is_revoked(payload):
+        return None
+    db.info["principal"] = payload.get("sub")
+    async with db as session:
+        async with session.begin():
+            return await UserDAL(session).get_user(user_id)
+
+
 async def get_current_user_from_token(
     token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
 ):
@@ -38,16 +220,29 @@ async def get_current_user_from_token(
         status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password"
     )
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
-        print(email)
-        if not email:
+        # the principal is the user id; emails are released when users are
+        # deleted, so the email alone may name someone else by now
+        user_id = UUID(payload["user_id"])
+        if not email or payload.get("type") == "refresh":
             raise credentials_exception
-    except JWTError:
+    except (JWTError, KeyError, ValueError):
         raise credentials_exception
-    user = await _get_user_by_email_for_auth(email, db)
-    if not user:
+    if await token_revocations.is_revoked(payload):
+        raise credentials_exception
+    db.info["principal"] = email
+    if settings.AUTH_STATELESS and "is_active" in payload:
+        if not payload["is_active"]:
+            raise credentials_exception
+        return _user_from_claims(payload)
+    user = principal_cache.get(user_id)
+    if user is None:
+        user = await _get_user_for_auth(user_id, db)
+        if not user:
+            raise credentials_exception
+        principal_cache.set(user)
+    # tokens issued before an email change name the old email
+    if user.email.lower() != email.lower():
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
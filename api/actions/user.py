@@ -1,12 +1,50 @@
+import base64
+import binascii
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator
+from typing import Sequence
+
+from sqlalchemy import Row
+
+import settings
+from api.actions.auth import principal_cache
+from api.actions.auth import unknown_emails
 from db.dals import UserDAL
 from api.models import ShowUser, UserCreate
+from api.models import UserBatchCreate
+from api.models import UserBatchCreateResponse
+from api.models import UserBatchCreateResult
+from api.models import UserBatchDeactivate
+from api.models import UserBatchDeactivateResponse
+from api.models import UserBatchDeactivateResult
+from api.models import UserBatchUpdate
+from api.models import UserBatchUpdateResponse
+from api.models import UserBatchUpdateResult
+from api.models import UserListResponse
 from hashing import Hasher
+from revocation import token_revocations
 from uuid import UUID
 from api.models import UpdateUserRequest
+from db.models import User
 
 
+def _show_user(user: User) -> ShowUser:
+    """Build a ShowUser from a trusted database row without re-validating it"""
+    return ShowUser.model_construct(
+        user_id=user.user_id,
+        name=user.name,
+        surname=user.surname,
+        email=user.email,
+        is_active=user.is_active,
+        version=user.version,
+    )
+
 
 async def _create_new_user(body: UserCreate, session) -> ShowUser:
+    hashed_password = await Hasher.get_password_hash_async(body.password)
     async with session.begin():
         user_dal = UserDAL(session)
 
@@ -14,23 +52,161 @@ async def _create_new_user(body: UserCreate, session) -> ShowUser:
             name=body.name,
             surname=body.surname,
             email=body.email,
-            hashed_password=Hasher.get_password_hash(body.password),
+            hashed_password=hashed_password,
         )
 
-        return ShowUser(
-            user_id=user.user_id,
-            name=user.name,
-            surname=user.surname,
-            email=user.email,
-            is_active=user.is_active,
+    unknown_emails.pop(body.email.lower())
+    return _show_user(user)
+
+
+async def _create_new_users(body: UserBatchCreate, session) -> UserBatchCreateResponse:
+    first_index_by_email = {}
+    for index, user in enumerate(body.users):
+        first_index_by_email.setdefault(user.email.lower(), index)
+    unique_users = [body.users[index] for index in first_index_by_email.values()]
+    hashed_passwords = await Hasher.get_password_hashes_async(
+        [user.password for user in unique_users]
+    )
+    async with session.begin():
+        user_dal = UserDAL(session)
+        created_users = await user_dal.create_users(
+            [
+                {
+                    "name": user.name,
+                    "surname": user.surname,
+                    "email": user.email,
+                    "hashed_password": hashed_password,
+                }
+                for user, hashed_password in zip(unique_users, hashed_passwords)
+            ]
         )
+    created_by_email = {user.email.lower(): user for user in created_users}
+    for email in created_by_email:
+        unknown_emails.pop(email)
+
+    results = []
+    for index, body_user in enumerate(body.users):
+        user = None
+        if first_index_by_email[body_user.email.lower()] == index:
+            user = created_by_email.get(body_user.email.lower())
+        if not user:
+            results.append(
+                UserBatchCreateResult(
+                    index=index, email=body_user.email, status="duplicate"
+                )
+            )
+            continue
+        results.append(
+            UserBatchCreateResult(
+                index=index,
+                email=body_user.email,
+                status="created",
+                user=_show_user(user),
+            )
+        )
+    return UserBatchCreateResponse(
+        created=len(created_users),
+        duplicates=len(results) - len(created_users),
+        results=results,
+    )
 
 
 async def _delete_user(user_id: UUID, session) -> UUID | None:
     async with session.begin():
         user_dal = UserDAL(session)
         deleted_user = await user_dal.delete_user(user_id)
-        return deleted_user
+    principal_cache.invalidate(user_id)
+    if deleted_user is not None:
+        await token_revocations.revoke_subject(str(user_id))
+    return deleted_user
+
+
+async def _deactivate_users(
+    body: UserBatchDeactivate, session
+) -> UserBatchDeactivateResponse:
+    user_ids = list(dict.fromkeys(body.user_ids))
+    async with session.begin():
+        user_dal = UserDAL(session)
+        deactivated_ids = set(await user_dal.deactivate_users(user_ids))
+    for user_id in user_ids:
+        principal_cache.invalidate(user_id)
+    for user_id in deactivated_ids:
+        await token_revocations.revoke_subject(str(user_id))
+    results = [
+        UserBatchDeactivateResult(
+            user_id=user_id,
+            status="deactivated" if user_id in deactivated_ids else "not_found",
+        )
+        for user_id in body.user_ids
+    ]
+    return UserBatchDeactivateResponse(
+        deactivated=len(deactivated_ids),
+        not_found=len(user_ids) - len(deactivated_ids),
+        results=results,
+    )
+
+
+async def _update_users(body: UserBatchUpdate, session) -> UserBatchUpdateResponse:
+    """Raises ValueError for items without changes or with a repeated user_id.
+
+    An item whose new email another active user already has, or an earlier
+    item of the batch for an active user claims, is skipped with the
+    ``conflict`` status.
+    """
+    user_ids = set()
+    for index, item in enumerate(body.users):
+        if item.user_id in user_ids:
+            raise ValueError(f"User {item.user_id} is listed more than once")
+        if item.model_dump(exclude_none=True).keys() == {"user_id"}:
+            raise ValueError(f"No changes for user {item.user_id} at index {index}")
+        user_ids.add(item.user_id)
+    async with session.begin():
+        user_dal = UserDAL(session)
+        new_emails = [item.email for item in body.users if item.email]
+        owners = {}
+        if new_emails:
+            owners = await user_dal.get_email_owners(
+                new_emails, [item.user_id for item in body.users if item.email]
+            )
+        active_ids = set(owners.values())
+        changes = []
+        conflicts = set()
+        for item in body.users:
+            # an item for a missing or inactive user is not_found, it claims nothing
+            if item.email and item.user_id in active_ids:
+                # the first item to claim a free email gets it
+                owner = owners.setdefault(item.email.lower(), item.user_id)
+                if owner != item.user_id:
+                    conflicts.add(item.user_id)
+                    continue
+            changes.append(item.model_dump(exclude_none=True))
+        updated_users = await user_dal.update_users(changes) if changes else []
+    for user_id in user_ids:
+        principal_cache.invalidate(user_id)
+    updated_by_id = {user.user_id: user for user in updated_users}
+    for user in updated_users:
+        unknown_emails.pop(user.email.lower())
+
+    results = []
+    for item in body.users:
+        user = updated_by_id.get(item.user_id)
+        if item.user_id in conflicts:
+            status = "conflict"
+        else:
+            status = "updated" if user else "not_found"
+        results.append(
+            UserBatchUpdateResult(
+                user_id=item.user_id,
+                status=status,
+                user=_show_user(user) if user else None,
+            )
+        )
+    return UserBatchUpdateResponse(
+        updated=len(updated_users),
+        not_found=len(results) - len(updated_users) - len(conflicts),
+        conflicts=len(conflicts),
+        results=results,
+    )
 
 
 async def _get_user_by_id(user_id: UUID, session) -> ShowUser | None:
@@ -38,20 +214,146 @@ async def _get_user_by_id(user_id: UUID, session) -> ShowUser | None:
         user_dal = UserDAL(session)
         user = await user_dal.get_user(user_id)
         if user:
-            return ShowUser(
-                user_id=user.user_id,
-                name=user.name,
-                surname=user.surname,
-                email=user.email,
-                is_active=user.is_active,
-            )
+            return _show_user(user)
+        return None
+
+
+def _encode_cursor(user_id: UUID) -> str:
+    return base64.urlsafe_b64encode(user_id.bytes).rstrip(b"=").decode()
+
+
+def _decode_cursor(cursor: str) -> UUID:
+    """Raises ValueError for cursors not produced by _encode_cursor"""
+    try:
+        return UUID(bytes=base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+async def _list_users(
+    limit: int, after_user_id: UUID | None, is_active: bool | None, session
+) -> UserListResponse:
+    async with session.begin():
+        user_dal = UserDAL(session)
+        users = await user_dal.list_users(
+            limit=limit + 1, after_user_id=after_user_id, is_active=is_active
+        )
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = _encode_cursor(users[-1].user_id)
+    return UserListResponse.model_construct(
+        users=[_show_user(user) for user in users], next_cursor=next_cursor
+    )
+
+
+EXPORT_COLUMNS = ("user_id", "name", "surname", "email", "is_active")
+
+
+def _rows_to_ndjson(rows: Sequence[Row]) -> bytes:
+    return "".join(
+        json.dumps(
+            {
+                "user_id": str(row.user_id),
+                "name": row.name,
+                "surname": row.surname,
+                "email": row.email,
+                "is_active": row.is_active,
+            },
+            ensure_ascii=False,
+        )
+        + "\n"
+        for row in rows
+    ).encode()
+
+
+def _rows_to_csv(rows: Sequence[Row], with_header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if with_header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def _gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def _export_users(
+    export_format: str, is_active: bool | None, session_factory
+) -> AsyncIterator[bytes]:
+    """Stream users as NDJSON or CSV with memory bounded by the fetch size.
+
+    Runs while the response is being sent, after the request's dependencies
+    have exited, so it uses a session of its own that is closed when the
+    stream ends or the client goes away.
+    """
+    async with session_factory() as session:
+        async with session.begin():
+            user_dal = UserDAL(session)
+            if export_format == "csv":
+                yield _rows_to_csv([], with_header=True)
+            async for rows in user_dal.stream_users(
+                settings.USER_EXPORT_FETCH_SIZE, is_active=is_active
+            ):
+                if export_format == "csv":
+                    yield _rows_to_csv(rows, with_header=False)
+                else:
+                    yield _rows_to_ndjson(rows)
+
+
+class UserVersionConflict(Exception):
+    """Raised when If-Match does not match the current user version"""
+
+
+def _user_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _etag_in(header: str, etag: str) -> bool:
+    """Weak comparison of an ETag against an If-None-Match header"""
+    if header.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag for candidate in header.split(",")
+    )
+
+
+def _parse_if_match(if_match: str | None) -> int | None:
+    """Return the version required by an If-Match header, None for any version.
+
+    Raises ValueError for values that are not ETags produced by _user_etag.
+    """
+    if if_match is None or if_match.strip() == "*":
         return None
+    try:
+        return int(if_match.strip().strip('"'))
+    except ValueError:
+        raise ValueError(f"Invalid If-Match header: {if_match}")
 
 
-async def _update_user(body: UpdateUserRequest, user_id, session) -> UUID | None:
+async def _update_user(
+    body: UpdateUserRequest, user_id, session, expected_version: int | None = None
+) -> User | None:
     async with session.begin():
         user_dal = UserDAL(session)
         updated_user = await user_dal.update_user(
-            user_id, **body.model_dump(exclude_none=True)
+            user_id,
+            expected_version=expected_version,
+            **body.model_dump(exclude_none=True),
         )
-        return updated_user
\ No newline at end of file
+        if updated_user is None and expected_version is not None:
+            if await user_dal.get_user_version(user_id) is not None:
+                raise UserVersionConflict(
+                    f"User with id {user_id} was modified, reload it and retry."
+                )
+    principal_cache.invalidate(user_id)
+    if updated_user is not None:
+        unknown_emails.pop(updated_user.email.lower())
+    return updated_user
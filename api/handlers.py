@@ -1,24 +1,53 @@
 from logging import getLogger
+from typing import Literal
+from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter
 from fastapi import Depends
+from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import settings
 from api.actions.auth import get_current_user_from_token
 from api.actions.user import _create_new_user
+from api.actions.user import _create_new_users
+from api.actions.user import _deactivate_users
+from api.actions.user import _decode_cursor
 from api.actions.user import _delete_user
+from api.actions.user import _etag_in
+from api.actions.user import _export_users
 from api.actions.user import _get_user_by_id
+from api.actions.user import _gzip_chunks
+from api.actions.user import _list_users
+from api.actions.user import _parse_if_match
 from api.actions.user import _update_user
+from api.actions.user import _update_users
+from api.actions.user import _user_etag
+from api.actions.user import UserVersionConflict
 from api.models import DeleteUserResponse
 from api.models import ShowUser
 from api.models import UpdateUserRequest
 from api.models import UpdateUserResponse
+from api.models import UserBatchCreate
+from api.models import UserBatchCreateResponse
+from api.models import UserBatchDeactivate
+from api.models import UserBatchDeactivateResponse
+from api.models import UserBatchUpdate
+from api.models import UserBatchUpdateResponse
 from api.models import UserCreate
+from api.models import UserListResponse
+from api.responses import ModelResponse
 from db.models import User
 from db.session import get_db
+from db.session import get_session_factory
+from hashing import HasherBusyError
 
 logger = getLogger(__name__)
 
@@ -26,14 +55,69 @@ user_router = APIRouter()
 
 
 @user_router.post("/", response_model=ShowUser)
-async def create_user(body: UserCreate, db: AsyncSession = Depends(get_db)) -> ShowUser:
+async def create_user(body: UserCreate, db: AsyncSession = Depends(get_db)):
     try:
-        return await _create_new_user(body, db)
+        return ModelResponse(await _create_new_user(body, db))
+    except HasherBusyError as e:
+        logger.warning(e)
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": "1"},
+        )
+    except IntegrityError as e:
+        logger.error(e)
+        raise HTTPException(status_code=503, detail=f"Database error: {e}")
+
+
+@user_router.post("/batch", response_model=UserBatchCreateResponse)
+async def create_users(
+    body: UserBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+):
+    try:
+        return ModelResponse(await _create_new_users(body, db))
+    except HasherBusyError as e:
+        logger.warning(e)
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": "1"},
+        )
     except IntegrityError as e:
         logger.error(e)
         raise HTTPException(status_code=503, detail=f"Database error: {e}")
 
 
+@user_router.post("/batch/deactivate", response_model=UserBatchDeactivateResponse)
+async def deactivate_users(
+    body: UserBatchDeactivate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+):
+    return ModelResponse(await _deactivate_users(body, db))
+
+
+@user_router.patch("/batch", response_model=UserBatchUpdateResponse)
+async def update_users(
+    body: UserBatchUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+):
+    try:
+        return ModelResponse(await _update_users(body, db))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IntegrityError as e:
+        # an email was taken by a concurrent request after it was checked
+        logger.warning(e)
+        raise HTTPException(
+            status_code=409,
+            detail="An email in the batch was just taken, nothing was updated",
+        )
+
+
 @user_router.delete("/", response_model=DeleteUserResponse)
 async def delete_user(
     user_id: UUID,
@@ -51,6 +135,7 @@ async def delete_user(
 @user_router.get("/", response_model=ShowUser)
 async def get_user(
     user_id: UUID,
+    if_none_match: Optional[str] = Header(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user_from_token),
 ):
@@ -59,13 +144,60 @@ async def get_user(
         raise HTTPException(
             status_code=404, detail=f"User with id {user_id} not found."
         )
-    return user
+    headers = {
+        "ETag": _user_etag(user.version),
+        "Cache-Control": settings.USER_CACHE_CONTROL,
+    }
+    if if_none_match and _etag_in(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return ModelResponse(user, headers=headers)
+
+
+@user_router.get("/list", response_model=UserListResponse)
+async def list_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(
+        default=settings.USER_LIST_DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=settings.USER_LIST_MAX_PAGE_SIZE,
+    ),
+    is_active: Optional[bool] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+):
+    try:
+        after_user_id = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ModelResponse(await _list_users(limit, after_user_id, is_active, db))
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@user_router.get("/export", response_class=StreamingResponse)
+async def export_users(
+    export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    is_active: Optional[bool] = None,
+    gzip: bool = False,
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+    current_user: User = Depends(get_current_user_from_token),
+) -> StreamingResponse:
+    content = _export_users(export_format, is_active, session_factory)
+    headers = {"Content-Disposition": f'attachment; filename="users.{export_format}"'}
+    if gzip:
+        content = _gzip_chunks(content)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        content, media_type=EXPORT_MEDIA_TYPES[export_format], headers=headers
+    )
 
 
 @user_router.patch("/", response_model=UpdateUserResponse)
 async def update_user_by_id(
     user_id: UUID,
     body: UpdateUserRequest,
+    if_match: Optional[str] = Header(default=None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user_from_token),
 ):
@@ -74,14 +206,29 @@ async def update_user_by_id(
             status_code=422,
             detail="At least one parameter for user update info should be provided",
         )
-    user = await _get_user_by_id(user_id, db)
-    if not user:
-        raise HTTPException(
-            status_code=404, detail=f"User with id {user_id} not found."
-        )
     try:
-        updated_user_id = await _update_user(body, user_id, db)
+        expected_version = _parse_if_match(if_match)
+    except ValueError as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    try:
+        updated_user = await _update_user(body, user_id, db, expected_version)
+    except UserVersionConflict as e:
+        raise HTTPException(status_code=412, detail=str(e))
     except IntegrityError as e:
         logger.error(e)
         raise HTTPException(status_code=503, detail=f"Database error: {e}")
-    return UpdateUserResponse(updated_user_id=updated_user_id)
+    if not updated_user:
+        raise HTTPException(
+            status_code=404, detail=f"User with id {user_id} not found."
+        )
+    return ModelResponse(
+        UpdateUserResponse.model_construct(
+            updated_user_id=updated_user.user_id,
+            user_id=updated_user.user_id,
+            name=updated_user.name,
+            surname=updated_user.surname,
+            email=updated_user.email,
+            is_active=updated_user.is_active,
+        ),
+        headers={"ETag": _user_etag(updated_user.version)},
+    )
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+
+from signing import signer
+
+jwks_router = APIRouter()
+
+
+@jwks_router.get("/.well-known/jwks.json", include_in_schema=False)
+async def jwks() -> dict:
+    return signer.jwks()
@@ -1,34 +1,95 @@
-from datetime import timedelta
+import math
+from logging import getLogger
 
 from fastapi import APIRouter
+from fastapi import BackgroundTasks
 from fastapi import Depends
 from fastapi import HTTPException
+from fastapi import Request
+from fastapi import Response
 from fastapi import status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession
 
-import settings
 from api.actions.auth import authenticate_user
+from api.actions.auth import issue_tokens
+from api.actions.auth import login_rate_limiter
+from api.actions.auth import oauth2_scheme
+from api.actions.auth import refresh_user
+from api.actions.auth import revoke_tokens
+from api.models import LogoutRequest
+from api.models import RefreshTokenRequest
 from api.models import Token
 from db.session import get_db
-from security import create_access_token
+from db.session import get_session_factory
+from hashing import HasherBusyError
+
+logger = getLogger(__name__)
 
 login_router = APIRouter()
 
 
 @login_router.post("/token", response_model=Token)
 async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
+    request: Request,
+    background_tasks: BackgroundTasks,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
 ):
-    user = await authenticate_user(form_data.username, form_data.password, db)
+    client_ip = request.client.host if request.client else None
+    retry_after = await login_rate_limiter.check(form_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    try:
+        user = await authenticate_user(
+            form_data.username,
+            form_data.password,
+            db,
+            background_tasks,
+            session_factory,
+        )
+    except HasherBusyError as e:
+        logger.warning(e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
         )
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email, "other_custom_data": [1, 2, 3, 4]},
-        expires_delta=access_token_expires,
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return issue_tokens(user)
+
+
+@login_router.post("/refresh", response_model=Token)
+async def refresh_access_token(
+    body: RefreshTokenRequest, db: AsyncSession = Depends(get_db)
+):
+    user = await refresh_user(body.refresh_token, db)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+        )
+    return issue_tokens(user)
+
+
+@login_router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    body: LogoutRequest | None = None, token: str = Depends(oauth2_scheme)
+) -> Response:
+    refresh_token = body.refresh_token if body is not None else None
+    if not await revoke_tokens(token, refresh_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
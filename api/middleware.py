@@ -0,0 +1,153 @@
+import hmac
+import os
+import sys
+import time
+import uuid
+
+import settings
+from db.session import query_stats
+from db.session import QueryStats
+from metrics import Counter
+from metrics import Histogram
+from profiling import RequestProfiler
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to handle a request, until the last byte of the response",
+    labelnames=("method", "route"),
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Handled requests by route and status code",
+    labelnames=("method", "route", "status"),
+)
+HTTP_REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "SQL statements executed while handling a request",
+    labelnames=("method", "route"),
+    buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 32),
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL statements while handling a request",
+    labelnames=("method", "route"),
+)
+
+
+def _route_path(scope) -> str:
+    route = scope.get("route")
+    # unmatched paths share one label to keep cardinality bounded
+    return route.path if route is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and status per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route_path = _route_path(scope)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(method, route_path).observe(
+                time.perf_counter() - started
+            )
+            HTTP_REQUESTS.labels(method, route_path, status_code).inc()
+
+
+class QueryStatsMiddleware:
+    """Counts SQL statements and database time per request.
+
+    With ``DEBUG`` on, the numbers so far are also sent in the
+    ``X-DB-Query-Count`` and ``X-DB-Time-Ms`` response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = query_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-time-ms", f"{stats.duration * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            query_stats.reset(token)
+            route_path = _route_path(scope)
+            method = scope["method"]
+            HTTP_REQUEST_DB_STATEMENTS.labels(method, route_path).observe(stats.count)
+            HTTP_REQUEST_DB_DURATION.labels(method, route_path).observe(stats.duration)
+
+
+class ProfilingMiddleware:
+    """Profiles requests that carry the profiling token.
+
+    The collapsed stacks are written to ``PROFILING_OUTPUT_DIR/<id>.folded`` and
+    the id is returned in the ``X-Profile-Id`` response header.
+    """
+
+    header = b"x-profile-token"
+
+    def __init__(self, app):
+        self.app = app
+        self.token = settings.PROFILING_TOKEN.encode()
+
+    def _authorized(self, scope) -> bool:
+        if not self.token:
+            return False
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._authorized(scope):
+            await self.app(scope, receive, send)
+            return
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-profile-id", profile_id.encode()),
+                ]
+            await send(message)
+
+        profiler = RequestProfiler(sys._getframe(), settings.PROFILING_INTERVAL_SECONDS)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+            path = os.path.join(settings.PROFILING_OUTPUT_DIR, f"{profile_id}.folded")
+            with open(path, "w") as f:
+                f.write(profiler.folded())
@@ -1,13 +1,17 @@
 import re
 import uuid
+from typing import Literal
 from typing import Optional
 
 from fastapi import HTTPException
 from pydantic import BaseModel
 from pydantic import constr
 from pydantic import EmailStr
+from pydantic import Field
 from pydantic import field_validator
 
+import settings
+
 
 LETTER_MATCH_PATTERN = re.compile(r"^[а-яА-Яa-zA-Z\-]+$")
 
@@ -25,6 +29,8 @@ class ShowUser(TunedModel):
     surname: str
     email: EmailStr
     is_active: bool
+    # row version, used for ETags and never serialized
+    version: Optional[int] = Field(default=None, exclude=True)
 
 
 class UserCreate(BaseModel):
@@ -50,6 +56,30 @@ class UserCreate(BaseModel):
         return value
 
 
+class UserBatchCreate(BaseModel):
+    users: list[UserCreate] = Field(
+        min_length=1, max_length=settings.USER_BATCH_MAX_SIZE
+    )
+
+
+class UserBatchCreateResult(BaseModel):
+    index: int
+    email: EmailStr
+    status: Literal["created", "duplicate"]
+    user: Optional[ShowUser] = None
+
+
+class UserBatchCreateResponse(BaseModel):
+    created: int
+    duplicates: int
+    results: list[UserBatchCreateResult]
+
+
+class UserListResponse(BaseModel):
+    users: list[ShowUser]
+    next_cursor: Optional[str] = None
+
+
 class DeleteUserResponse(BaseModel):
     deleted_user_id: uuid.UUID
 
@@ -76,10 +106,59 @@ class UpdateUserRequest(BaseModel):
         return value
 
 
-class UpdateUserResponse(BaseModel):
+class UpdateUserResponse(ShowUser):
     updated_user_id: uuid.UUID
 
 
+class UserBatchUpdateItem(UpdateUserRequest):
+    user_id: uuid.UUID
+
+
+class UserBatchUpdate(BaseModel):
+    users: list[UserBatchUpdateItem] = Field(
+        min_length=1, max_length=settings.USER_BATCH_MAX_SIZE
+    )
+
+
+class UserBatchUpdateResult(BaseModel):
+    user_id: uuid.UUID
+    status: Literal["updated", "not_found", "conflict"]
+    user: Optional[ShowUser] = None
+
+
+class UserBatchUpdateResponse(BaseModel):
+    updated: int
+    not_found: int
+    conflicts: int
+    results: list[UserBatchUpdateResult]
+
+
+class UserBatchDeactivate(BaseModel):
+    user_ids: list[uuid.UUID] = Field(
+        min_length=1, max_length=settings.USER_BATCH_MAX_SIZE
+    )
+
+
+class UserBatchDeactivateResult(BaseModel):
+    user_id: uuid.UUID
+    status: Literal["deactivated", "not_found"]
+
+
+class UserBatchDeactivateResponse(BaseModel):
+    deactivated: int
+    not_found: int
+    results: list[UserBatchDeactivateResult]
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
@@ -0,0 +1,15 @@
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+class ModelResponse(Response):
+    """JSON response rendered directly by the model's compiled serializer.
+
+    Returning it from a handler skips FastAPI's response_model validation, so
+    it is only meant for models built from trusted data such as database rows.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return type(content).__pydantic_serializer__.to_json(content)
@@ -0,0 +1,220 @@
+"""HTTP load test for the user and login endpoints.
+
+Seeds users, then runs a weighted mix of requests from concurrent workers
+and prints throughput, latency percentiles and error rates as JSON.
+
+    python -m benchmarks.loadtest --base-url http://127.0.0.1:8000 \
+        --concurrency 50 --duration 30 --mix get=60,patch=15,create=10,delete=5,login=10
+
+With --in-process the requests go straight to main.app through httpx's ASGI
+transport, using the database configured by REAL_DATABASE_URL.
+
+Logins hit the login rate limits (LOGIN_RATE_LIMIT_*), which a load test from
+one host with a few seeded users exceeds within seconds. 429 responses are
+reported as ``throttled`` rather than as errors; to measure login itself,
+raise the limits on the server under test, e.g.
+LOGIN_RATE_LIMIT_EMAIL_BURST=1000000 LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE=1000000
+LOGIN_RATE_LIMIT_IP_BURST=1000000 LOGIN_RATE_LIMIT_IP_PER_MINUTE=1000000.
+"""
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+OPERATIONS = ("create", "get", "patch", "delete", "login")
+DEFAULT_MIX = "get=60,patch=15,create=10,delete=5,login=10"
+PASSWORD = "load-test-password"
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation in mix: {name}")
+        weights[name] = int(weight)
+    return weights
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(
+    latencies: list[float], errors: int, throttled: int, elapsed: float
+) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "errors": errors,
+        "throttled": throttled,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def _name() -> str:
+    return "".join(random.choices(string.ascii_letters, k=8))
+
+
+def _user_body() -> dict:
+    return {
+        "name": _name(),
+        "surname": _name(),
+        "email": f"load-{uuid.uuid4().hex}@loadtest.io",
+        "password": PASSWORD,
+    }
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, weights: dict[str, int]):
+        self.client = client
+        self.operations = list(weights)
+        self.weights = list(weights.values())
+        self.seeded: list[dict] = []
+        self.created: list[str] = []
+        self.headers: dict[str, str] = {}
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.throttled: dict[str, int] = defaultdict(int)
+
+    async def seed(self, users: int) -> None:
+        for _ in range(users):
+            body = _user_body()
+            resp = await self.client.post("/user/", json=body)
+            resp.raise_for_status()
+            self.seeded.append(resp.json())
+        resp = await self.client.post(
+            "/login/token",
+            data={"username": self.seeded[0]["email"], "password": PASSWORD},
+        )
+        resp.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    async def _request(self, operation: str) -> httpx.Response:
+        user = random.choice(self.seeded)
+        if operation == "create":
+            resp = await self.client.post("/user/", json=_user_body())
+            if resp.status_code == 200:
+                self.created.append(resp.json()["user_id"])
+            return resp
+        if operation == "get":
+            return await self.client.get(
+                "/user/", params={"user_id": user["user_id"]}, headers=self.headers
+            )
+        if operation == "patch":
+            return await self.client.patch(
+                "/user/",
+                params={"user_id": user["user_id"]},
+                json={"surname": _name()},
+                headers=self.headers,
+            )
+        if operation == "delete":
+            return await self.client.delete(
+                "/user/", params={"user_id": self.created.pop()}, headers=self.headers
+            )
+        return await self.client.post(
+            "/login/token", data={"username": user["email"], "password": PASSWORD}
+        )
+
+    async def worker(self, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            operation = random.choices(self.operations, self.weights)[0]
+            if operation == "delete" and not self.created:
+                # only users created during the run are deleted, so seeded ones stay
+                operation = "create"
+            started = time.perf_counter()
+            status_code = None
+            try:
+                resp = await self._request(operation)
+                status_code = resp.status_code
+            except httpx.HTTPError:
+                pass
+            self.latencies[operation].append(time.perf_counter() - started)
+            if status_code == 429:
+                self.throttled[operation] += 1
+            elif status_code is None or status_code >= 400:
+                self.errors[operation] += 1
+
+    async def run(self, concurrency: int, duration: float) -> dict:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(self.worker(deadline) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        all_latencies = [
+            latency for latencies in self.latencies.values() for latency in latencies
+        ]
+        return {
+            "concurrency": concurrency,
+            "duration_s": round(elapsed, 2),
+            "total": summarize(
+                all_latencies,
+                sum(self.errors.values()),
+                sum(self.throttled.values()),
+                elapsed,
+            ),
+            "operations": {
+                operation: summarize(
+                    latencies,
+                    self.errors[operation],
+                    self.throttled[operation],
+                    elapsed,
+                )
+                for operation, latencies in sorted(self.latencies.items())
+            },
+        }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    if args.in_process:
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://loadtest"
+    else:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=args.concurrency)
+        )
+        base_url = args.base_url
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, timeout=args.timeout
+    ) as client:
+        load_test = LoadTest(client, args.mix)
+        await load_test.seed(args.users)
+        return await load_test.run(args.concurrency, args.duration)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--in-process", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--users", type=int, default=20, help="users to seed")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
@@ -0,0 +1,131 @@
+"""Microbenchmarks for the hot paths, with a stored baseline and regression gate.
+
+    python -m benchmarks.micro run --save benchmarks/baseline.json
+    python -m benchmarks.micro compare benchmarks/baseline.json --threshold 0.2
+
+``compare`` exits with status 1 when any benchmark is slower than its baseline
+by more than the threshold. Baselines are machine specific, so record them on
+the machine that runs the comparison.
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import timedelta
+
+from jose import jwt
+
+import settings
+from api.models import UpdateUserRequest
+from api.models import UserCreate
+from benchmarks import serialization
+from hashing import Hasher
+from security import create_access_token
+from security import decode_access_token
+from signing import signer
+
+USER_CREATE = {
+    "name": "Nikolai",
+    "surname": "Sviridov",
+    "email": "lol@kek.com",
+    "password": "<PASSWORD>",
+}
+UPDATE_USER = {"name": "Ivan", "surname": "Ivanov", "email": "ivan@kek.com"}
+
+
+def _benchmarks() -> dict[str, tuple]:
+    """Name -> (callable, calls per timing round)"""
+    password_hash = Hasher.get_password_hash("<PASSWORD>")
+    token = create_access_token({"sub": "lol@kek.com"}, timedelta(minutes=5))
+    user = serialization.make_user_row()
+    return {
+        "hasher_get_password_hash": (
+            lambda: Hasher.get_password_hash("<PASSWORD>"),
+            3,
+        ),
+        "hasher_verify_password": (
+            lambda: Hasher.verify_password("<PASSWORD>", password_hash),
+            3,
+        ),
+        "security_create_access_token": (
+            lambda: create_access_token({"sub": "lol@kek.com"}),
+            2000,
+        ),
+        "jwt_decode": (
+            lambda: jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            ),
+            2000,
+        ),
+        "signer_decode": (lambda: signer.decode(token), 2000),
+        "jwt_decode_cached": (lambda: decode_access_token(token), 20000),
+        "user_create_validation": (
+            lambda: UserCreate.model_validate(USER_CREATE),
+            20000,
+        ),
+        "update_user_request_validation": (
+            lambda: UpdateUserRequest.model_validate(UPDATE_USER),
+            20000,
+        ),
+        **{
+            name: (lambda fn=fn: fn(user), 20000)
+            for name, fn in serialization.BENCHMARKS.items()
+        },
+    }
+
+
+def run(repeat: int = 5) -> dict[str, float]:
+    """Return the best time per call in microseconds for every benchmark"""
+    results = {}
+    for name, (fn, number) in _benchmarks().items():
+        best = min(timeit.repeat(fn, number=number, repeat=repeat))
+        results[name] = round(best / number * 1e6, 3)
+    return results
+
+
+def compare(
+    baseline: dict[str, float], current: dict[str, float], threshold: float
+) -> list[str]:
+    """Return the names of benchmarks slower than baseline * (1 + threshold)"""
+    return [
+        name
+        for name, microseconds in current.items()
+        if name in baseline and microseconds > baseline[name] * (1 + threshold)
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--save", help="write results to this baseline file")
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    current = run(args.repeat)
+    if args.command == "run":
+        for name, microseconds in current.items():
+            print(f"{name}: {microseconds:.3f} us")
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(current, f, indent=2, sort_keys=True)
+                f.write("\n")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for name, microseconds in current.items():
+        base = baseline.get(name)
+        change = f"{(microseconds / base - 1) * 100:+.1f}%" if base else "new"
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name}: {microseconds:.3f} us ({change}){flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
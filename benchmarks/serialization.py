@@ -0,0 +1,73 @@
+"""Per-response CPU cost of rendering a ShowUser.
+
+Compares the previous path (validated ShowUser, re-validated against the
+response_model, encoded with the stdlib JSON encoder) with the current one
+(ShowUser.model_construct rendered by ModelResponse).
+
+    python -m benchmarks.serialization
+"""
+import json
+import timeit
+import uuid
+
+from pydantic import TypeAdapter
+
+from api.actions.user import _show_user
+from api.models import ShowUser
+from api.responses import ModelResponse
+from db.models import User
+
+RESPONSE_MODEL_ADAPTER = TypeAdapter(ShowUser)
+
+
+def make_user_row() -> User:
+    return User(
+        user_id=uuid.uuid4(),
+        name="Nikolai",
+        surname="Sviridov",
+        email="lol@kek.com",
+        is_active=True,
+        hashed_password="<PASSWORD>",
+        version=1,
+    )
+
+
+def validated_response(user: User) -> bytes:
+    show_user = ShowUser(
+        user_id=user.user_id,
+        name=user.name,
+        surname=user.surname,
+        email=user.email,
+        is_active=user.is_active,
+    )
+    value = RESPONSE_MODEL_ADAPTER.validate_python(show_user)
+    content = RESPONSE_MODEL_ADAPTER.dump_python(value, mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def trusted_response(user: User) -> bytes:
+    return ModelResponse(_show_user(user)).body
+
+
+BENCHMARKS = {
+    "show_user_validated_response": validated_response,
+    "show_user_trusted_response": trusted_response,
+}
+
+
+def run(number: int = 20000, repeat: int = 5) -> dict[str, float]:
+    """Return the best time per call in microseconds for every benchmark"""
+    user = make_user_row()
+    return {
+        name: min(timeit.repeat(lambda: fn(user), number=number, repeat=repeat))
+        / number
+        * 1e6
+        for name, fn in BENCHMARKS.items()
+    }
+
+
+if __name__ == "__main__":
+    for name, microseconds in run().items():
+        print(f"{name}: {microseconds:.2f} us/response")
@@ -0,0 +1,82 @@
+"""Encode/decode throughput of the JWT backends in signing.py.
+
+    python -m benchmarks.signing --seconds 1
+
+Keys are generated in memory. Combinations whose backend or key type is not
+installed (PyJWT, cryptography) are reported as skipped.
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import UTC
+
+import ecdsa
+import rsa
+
+from signing import create_signer
+
+ALGORITHMS = ("HS256", "RS256", "ES256", "EdDSA")
+
+
+def _key_material(algorithm: str) -> bytes:
+    if algorithm == "HS256":
+        return b"benchmark-secret-of-32-bytes-len"
+    if algorithm == "RS256":
+        return rsa.newkeys(2048)[1].save_pkcs1()
+    if algorithm == "ES256":
+        return ecdsa.SigningKey.generate(curve=ecdsa.NIST256p).to_pem()
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+
+    return ed25519.Ed25519PrivateKey.generate().private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def _ops_per_second(fn, seconds: float) -> float:
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        calls += 1
+    return round(calls / (time.perf_counter() - started), 1)
+
+
+def run(seconds: float) -> dict:
+    claims = {
+        "sub": "lol@kek.com",
+        "exp": datetime.now(UTC) + timedelta(hours=1),
+        "jti": "0" * 32,
+    }
+    results = {}
+    for algorithm in ALGORITHMS:
+        try:
+            material = _key_material(algorithm)
+        except ImportError as e:
+            results[algorithm] = f"skipped: {e}"
+            continue
+        for backend in ("jose", "pyjwt"):
+            name = f"{backend}/{algorithm}"
+            try:
+                signer = create_signer(backend, algorithm, {"bench": material}, "bench")
+            except (ImportError, RuntimeError, ValueError) as e:
+                results[name] = f"skipped: {e}"
+                continue
+            token = signer.encode(claims)
+            results[name] = {
+                "encode_per_s": _ops_per_second(lambda: signer.encode(claims), seconds),
+                "decode_per_s": _ops_per_second(lambda: signer.decode(token), seconds),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=1, help="per measurement")
+    args = parser.parse_args()
+    print(json.dumps(run(args.seconds), indent=2))
@@ -1,11 +1,57 @@
+import uuid
+from typing import AsyncIterator
+from typing import Sequence
 from uuid import UUID
 
 from sqlalchemy import and_
+from sqlalchemy import any_
+from sqlalchemy import bindparam
+from sqlalchemy import column
+from sqlalchemy import event
+from sqlalchemy import func
+from sqlalchemy import Row
 from sqlalchemy import select
+from sqlalchemy import String
 from sqlalchemy import update
+from sqlalchemy import values
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.models import User
+from db.session import reads_primary
+from db.user_cache import MISSING
+from db.user_cache import NOT_CACHED
+from db.user_cache import user_cache
+from singleflight import SingleFlight
+
+
+# asyncpg accepts at most 32767 bind parameters per statement
+CREATE_USERS_CHUNK_SIZE = 1000
+UPDATE_USERS_CHUNK_SIZE = 1000
+
+UPDATABLE_FIELDS = ("name", "surname", "email")
+
+# concurrent lookups of the same user share one query; sessions that must see
+# their own writes are keyed apart so they never get a result read before them
+user_lookups = SingleFlight("user_lookup")
+
+
+def _detached_copy(user: User | None) -> User | None:
+    """Transient copy of a loaded user, safe to share between sessions"""
+    if user is None:
+        return None
+    return User(
+        **{column.key: getattr(user, column.key) for column in User.__table__.columns}
+    )
+
+
+def _read_mode(own_writes: bool, from_replica: bool) -> str:
+    """Lookups are only shared between callers that read from the same place"""
+    if own_writes:
+        return "own_writes"
+    return "replica" if from_replica else "primary"
 
 
 class UserDAL:
@@ -14,6 +60,17 @@ class UserDAL:
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
+    async def _invalidate(self, user_ids=(), emails=()) -> None:
+        """Drop cached users now and again after commit, so a read racing the
+        transaction cannot keep the old row cached"""
+        await user_cache.invalidate(user_ids, emails)
+        event.listen(
+            self.db_session.sync_session,
+            "after_commit",
+            lambda session: user_cache.invalidate_soon(user_ids, emails),
+            once=True,
+        )
+
     async def create_user(
         self, name: str, surname: str, email: str, hashed_password: str
     ) -> User:
@@ -25,44 +82,292 @@ class UserDAL:
         )
         self.db_session.add(new_user)
         await self.db_session.flush()
+        await self._invalidate([new_user.user_id], [email])
         return new_user
 
+    async def create_users(self, users: list[dict]) -> list[User]:
+        """Insert users with multi-row INSERTs, skipping emails that an active
+        user already has in any case.
+
+        Returns only the rows that were inserted.
+        """
+        created_users = []
+        for start in range(0, len(users), CREATE_USERS_CHUNK_SIZE):
+            rows = [
+                {"user_id": uuid.uuid4(), **user}
+                for user in users[start : start + CREATE_USERS_CHUNK_SIZE]
+            ]
+            query = (
+                insert(User)
+                .values(rows)
+                .on_conflict_do_nothing(
+                    index_elements=[func.lower(User.email)],
+                    index_where=User.is_active,
+                )
+                .returning(User)
+            )
+            res = await self.db_session.execute(query)
+            created_users.extend(res.scalars().all())
+        await self._invalidate(
+            [user.user_id for user in created_users],
+            [user.email for user in created_users],
+        )
+        return created_users
+
     async def delete_user(self, user_id: UUID) -> UUID | None:
         query = (
             update(User)
             .where(and_(User.user_id == user_id, User.is_active == True))
-            .values(is_active=False)
+            .values(is_active=False, version=User.version + 1)
             .returning(User.user_id)
         )
         res = await self.db_session.execute(query)
         deleted_user = res.fetchone()
+        await self._invalidate([user_id])
         if deleted_user:
             return deleted_user[0]
         return None
 
+    async def deactivate_users(self, user_ids: list[UUID]) -> list[UUID]:
+        """Deactivate active users with one UPDATE and return the ids it changed"""
+        ids = bindparam("user_ids", list(user_ids), type_=ARRAY(PG_UUID(as_uuid=True)))
+        query = (
+            update(User)
+            .where(and_(User.user_id == any_(ids), User.is_active == True))
+            .values(is_active=False, version=User.version + 1)
+            .returning(User.user_id)
+        )
+        res = await self.db_session.execute(query)
+        deactivated_ids = list(res.scalars().all())
+        await self._invalidate(user_ids)
+        return deactivated_ids
+
+    async def update_users(self, changes: list[dict]) -> list[User]:
+        """Apply per-user field changes to active users and return the new rows.
+
+        Each change has a ``user_id`` and any of UPDATABLE_FIELDS; a chunk of
+        changes is joined as a VALUES list in one ``UPDATE ... FROM``, where a
+        missing field keeps its current value.
+        """
+        changes_columns = values(
+            column("user_id", PG_UUID(as_uuid=True)),
+            *(column(field, String) for field in UPDATABLE_FIELDS),
+            name="changes",
+        )
+        updated_users = []
+        for start in range(0, len(changes), UPDATE_USERS_CHUNK_SIZE):
+            rows = [
+                (change["user_id"], *(change.get(field) for field in UPDATABLE_FIELDS))
+                for change in changes[start : start + UPDATE_USERS_CHUNK_SIZE]
+            ]
+            changed = changes_columns.data(rows)
+            query = (
+                update(User)
+                .where(and_(User.user_id == changed.c.user_id, User.is_active == True))
+                .values(
+                    **{
+                        field: func.coalesce(changed.c[field], getattr(User, field))
+                        for field in UPDATABLE_FIELDS
+                    },
+                    version=User.version + 1,
+                )
+                .returning(User)
+                .execution_options(populate_existing=True)
+            )
+            res = await self.db_session.execute(query)
+            updated_users.extend(res.scalars().all())
+        await self._invalidate(
+            [change["user_id"] for change in changes],
+            [change["email"] for change in changes if change.get("email")],
+        )
+        return updated_users
+
+    async def get_email_owners(
+        self, emails: list[str], user_ids: list[UUID] = ()
+    ) -> dict[str, UUID]:
+        """Ids of the active users that hold these emails, by lowercased email.
+
+        Active users among ``user_ids`` are included under their own email, so
+        one query also tells which of them exist.
+        """
+        lowered = bindparam(
+            "emails", [email.lower() for email in emails], type_=ARRAY(String)
+        )
+        ids = bindparam("user_ids", list(user_ids), type_=ARRAY(PG_UUID(as_uuid=True)))
+        query = select(func.lower(User.email), User.user_id).where(
+            and_(
+                (func.lower(User.email) == any_(lowered)) | (User.user_id == any_(ids)),
+                User.is_active == True,
+            )
+        )
+        res = await self.db_session.execute(query)
+        return dict(res.all())
+
     async def get_user(self, user_id: UUID) -> User | None:
-        query = select(User).where(User.user_id == user_id)
+        """The active user, served from the user cache when this session may.
+
+        A cached user is a transient instance without ``hashed_password``.
+        Misses that fill the cache read the primary, so replica lag cannot put
+        a row older than the last invalidation back into the cache.
+        """
+        primary = reads_primary(self.db_session)
+        fill_cache = not primary and user_cache.enabled
+        if fill_cache:
+            cached = await user_cache.get_by_id(user_id)
+            if cached is not NOT_CACHED:
+                return None if cached == MISSING else cached
+        key = ("user_id", user_id, _read_mode(primary, not fill_cache))
+        return await user_lookups.do(key, self._load_user, user_id, fill_cache)
+
+    async def _load_user(self, user_id: UUID, fill_cache: bool) -> User | None:
+        # taken before the query, so a write committed meanwhile voids the fill
+        generation = await user_cache.id_generation(user_id) if fill_cache else None
+        # shared with concurrent callers, so never the instance of this session
+        user = _detached_copy(
+            await self._get_user(user_id, from_replica=not fill_cache)
+        )
+        if fill_cache:
+            if user is None:
+                await user_cache.set_missing_id(user_id, generation)
+            else:
+                await user_cache.set_user(user, generation)
+        return user
+
+    async def _get_user(self, user_id: UUID, from_replica: bool) -> User | None:
+        query = (
+            select(User)
+            .where(and_(User.user_id == user_id, User.is_active == True))
+            .execution_options(read_replica=from_replica)
+        )
         res = await self.db_session.execute(query)
         received_user = res.scalars().one_or_none()
         if received_user:
             return received_user
         return None
 
-    async def update_user(self, user_id, **kwargs) -> UUID | None:
+    async def list_users(
+        self,
+        limit: int,
+        after_user_id: UUID | None = None,
+        is_active: bool | None = None,
+    ) -> list[User]:
+        """Page through users ordered by primary key (keyset pagination)"""
+        query = (
+            select(User)
+            .order_by(User.user_id)
+            .limit(limit)
+            .execution_options(read_replica=True)
+        )
+        if after_user_id is not None:
+            query = query.where(User.user_id > after_user_id)
+        if is_active is not None:
+            query = query.where(User.is_active == is_active)
+        res = await self.db_session.execute(query)
+        return list(res.scalars().all())
+
+    async def stream_users(
+        self, fetch_size: int, is_active: bool | None = None
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Yield public user columns in batches read from a server-side cursor"""
+        query = (
+            select(User.user_id, User.name, User.surname, User.email, User.is_active)
+            .order_by(User.user_id)
+            .execution_options(yield_per=fetch_size, read_replica=True)
+        )
+        if is_active is not None:
+            query = query.where(User.is_active == is_active)
+        res = await self.db_session.stream(query)
+        async for rows in res.partitions():
+            yield rows
+
+    async def update_user(
+        self, user_id: UUID, expected_version: int | None = None, **kwargs
+    ) -> User | None:
+        """Update an active user in one round trip and return the new row.
+
+        With ``expected_version`` the row is only updated if its version still
+        matches; None is returned both when the user is missing and on conflict.
+        """
         query = (
             update(User)
             .where(and_(User.user_id == user_id, User.is_active == True))
-            .values(**kwargs)
+            .values(**kwargs, version=User.version + 1)
+            .returning(User)
+            .execution_options(populate_existing=True)
+        )
+        if expected_version is not None:
+            query = query.where(User.version == expected_version)
+        res = await self.db_session.execute(query)
+        await self._invalidate(
+            [user_id], [kwargs["email"]] if "email" in kwargs else ()
+        )
+        return res.scalars().one_or_none()
+
+    async def update_password_hash(
+        self, user_id: UUID, old_hash: str, new_hash: str
+    ) -> bool:
+        """Swap the hash unless the password changed since ``old_hash`` was read"""
+        query = (
+            update(User)
+            .where(and_(User.user_id == user_id, User.hashed_password == old_hash))
+            .values(hashed_password=new_hash)
             .returning(User.user_id)
         )
         res = await self.db_session.execute(query)
-        updated_user_id = res.fetchone()
-        if updated_user_id:
-            return updated_user_id[0]
-        return None
+        return res.scalar_one_or_none() is not None
+
+    async def get_user_version(self, user_id: UUID) -> int | None:
+        query = select(User.version).where(
+            and_(User.user_id == user_id, User.is_active == True)
+        )
+        res = await self.db_session.execute(query)
+        return res.scalar_one_or_none()
 
-    async def get_user_by_email(self, email: str) -> User | None:
-        query = select(User).where(User.email == email)
+    async def get_user_by_email(
+        self, email: str, with_password: bool = False
+    ) -> User | None:
+        """The active user with this email in any case.
+
+        ``with_password`` is the login lookup: it skips the user cache, whose
+        entries do not keep ``hashed_password``, and reads the primary, so a
+        user who has just signed up is not taken for an unknown email.
+        """
+        primary = reads_primary(self.db_session)
+        fill_cache = not primary and not with_password and user_cache.enabled
+        if fill_cache:
+            cached = await user_cache.get_by_email(email)
+            if cached is not NOT_CACHED:
+                return None if cached == MISSING else cached
+        from_replica = not fill_cache and not with_password
+        key = ("email", email.lower(), _read_mode(primary, from_replica))
+        return await user_lookups.do(
+            key, self._load_user_by_email, email, fill_cache, from_replica
+        )
+
+    async def _load_user_by_email(
+        self, email: str, fill_cache: bool, from_replica: bool
+    ) -> User | None:
+        generation = await user_cache.email_generation(email) if fill_cache else None
+        user = _detached_copy(
+            await self._get_user_by_email(email, from_replica=from_replica)
+        )
+        # the id entry is only filled by get_user, which knows the id up front
+        # and can take its generation before the query
+        if fill_cache:
+            if user is None:
+                await user_cache.set_missing_email(email, generation)
+            else:
+                await user_cache.set_email_owner(email, user.user_id, generation)
+        return user
+
+    async def _get_user_by_email(self, email: str, from_replica: bool) -> User | None:
+        query = (
+            select(User)
+            .where(
+                and_(func.lower(User.email) == email.lower(), User.is_active == True)
+            )
+            .execution_options(read_replica=from_replica)
+        )
         res = await self.db_session.execute(query)
         received_user = res.scalars().one_or_none()
         if received_user:
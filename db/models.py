@@ -1,5 +1,7 @@
 import uuid
 
+from sqlalchemy import func
+from sqlalchemy import Index
 from sqlalchemy import UUID
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import Mapped
@@ -16,6 +18,18 @@ class User(Base):
     )
     name: Mapped[str]
     surname: Mapped[str]
-    email: Mapped[str] = mapped_column(unique=True)
+    email: Mapped[str]
     is_active: Mapped[bool] = mapped_column(default=True)
     hashed_password: Mapped[str]
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
+
+
+# emails are unique among active users regardless of case; deactivated users
+# release theirs
+Index(
+    "ix_users_email_lower_active",
+    func.lower(User.email),
+    unique=True,
+    postgresql_where=User.is_active,
+)
+Index("ix_users_active_user_id", User.user_id, postgresql_where=User.is_active)
@@ -1,11 +1,269 @@
+import asyncio
+import itertools
+import time
+from contextvars import ContextVar
+from logging import getLogger
+
+from sqlalchemy import event
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 import settings
+from cache import TTLCache
+from metrics import Gauge
+from metrics import Histogram
+from metrics import register_collector
+
+logger = getLogger(__name__)
+
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "Duration of SQL statements sent to the database",
+    labelnames=("engine", "operation"),
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    labelnames=("engine",),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently in use", labelnames=("engine",)
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond pool_size", labelnames=("engine",)
+)
+DB_POOL_WAITERS = Gauge(
+    "db_pool_waiters", "Callers waiting for a connection", labelnames=("engine",)
+)
+DB_POOL_UTILIZATION = Gauge(
+    "db_pool_utilization",
+    "Connections in use divided by pool_size + max_overflow",
+    labelnames=("engine",),
+)
+STATEMENT_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+class QueryStats:
+    """Statements executed and time spent in the database by one request"""
+
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# set per request by QueryStatsMiddleware; None outside of a request
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _redact_parameters(parameters, many: bool):
+    """Keep only the shape and types of bound parameters"""
+    if many:
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that counts callers currently waiting for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiters = 0
+
+    @property
+    def metrics_name(self) -> str:
+        return self._orig_logging_name or "primary"
+
+    def _do_get(self):
+        self.waiters += 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.waiters -= 1
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_name).observe(
+                time.perf_counter() - started
+            )
+
+
+def create_engine(url: str, name: str = "primary"):
+    """Create an engine whose pool and statements are reported as ``name``"""
+    engine = create_async_engine(
+        url,
+        future=True,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedQueuePool,
+        pool_logging_name=name,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "command_timeout": settings.DB_COMMAND_TIMEOUT,
+        },
+    )
+    _instrument_engine(engine, name)
+    return engine
+
+
+def _instrument_engine(engine: AsyncEngine, name: str) -> None:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        context.statement_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        operation = statement.lstrip()[:6].upper()
+        if operation not in STATEMENT_OPERATIONS:
+            operation = "OTHER"
+        elapsed = time.perf_counter() - context.statement_started
+        DB_STATEMENT_DURATION.labels(name, operation).observe(elapsed)
+        stats = query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+        if elapsed >= settings.DB_SLOW_QUERY_SECONDS:
+            logger.warning(
+                "Slow query on %s took %.1f ms: %s parameters=%s",
+                name,
+                elapsed * 1000,
+                statement,
+                _redact_parameters(parameters, many),
+            )
+
+
+def get_pool_stats(engine) -> dict[str, int]:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "waiters": getattr(pool, "waiters", 0),
+    }
+
+
+class ReplicaSet:
+    """Round-robin over read replicas, skipping ones that recently failed"""
+
+    def __init__(self, engines: list[AsyncEngine], retry_after: float):
+        self.engines = engines
+        self.retry_after = retry_after
+        self._order = itertools.cycle(range(len(engines)))
+        self._down_until = [0.0] * len(engines)
+        for index, replica in enumerate(engines):
+            event.listen(replica.sync_engine, "handle_error", self._on_error_for(index))
+
+    def _on_error_for(self, index: int):
+        def on_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(index)
+
+        return on_error
+
+    def mark_down(self, index: int) -> None:
+        logger.warning("Read replica %s is unavailable", index)
+        self._down_until[index] = time.monotonic() + self.retry_after
+
+    def choose(self) -> AsyncEngine | None:
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            index = next(self._order)
+            if self._down_until[index] <= now:
+                return self.engines[index]
+        return None
+
+    async def check_health(self) -> None:
+        for index, replica in enumerate(self.engines):
+            try:
+                async with replica.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+            except Exception:
+                self.mark_down(index)
+            else:
+                self._down_until[index] = 0.0
+
+    async def run_health_checks(self, interval: float) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(interval)
+
+
+engine = create_engine(settings.REAL_DATABASE_URL)
+
+replica_set = ReplicaSet(
+    [
+        create_engine(url, name=f"replica{index}")
+        for index, url in enumerate(settings.DB_READ_REPLICA_URLS)
+    ],
+    settings.DB_REPLICA_RETRY_SECONDS,
+)
+
+
+def _collect_pool_stats() -> None:
+    for pooled_engine in [engine, *replica_set.engines]:
+        stats = get_pool_stats(pooled_engine)
+        name = pooled_engine.pool.metrics_name
+        capacity = stats["size"] + settings.DB_MAX_OVERFLOW
+        DB_POOL_CHECKED_OUT.labels(name).set(stats["checked_out"])
+        DB_POOL_OVERFLOW.labels(name).set(stats["overflow"])
+        DB_POOL_WAITERS.labels(name).set(stats["waiters"])
+        DB_POOL_UTILIZATION.labels(name).set(stats["checked_out"] / capacity)
+
+
+register_collector(_collect_pool_stats)
+
+# principals that wrote recently and must read from the primary
+recent_writers = TTLCache(
+    "recent_writers", max_size=100_000, ttl=settings.DB_READ_YOUR_WRITES_SECONDS
+)
+
+
+def reads_primary(session) -> bool:
+    """Whether reads of ``session`` must see its principal's own writes"""
+    return bool(session.info.get("wrote")) or (
+        session.info.get("principal") in recent_writers
+    )
+
+
+class RoutingSession(Session):
+    """Sends statements marked with the ``read_replica`` execution option to a
+    replica and everything else to the primary.
+
+    Once the session writes, or while its principal is in ``recent_writers``,
+    reads stay on the primary so callers see their own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if clause is not None and clause.get_execution_options().get("read_replica"):
+            if not reads_primary(self):
+                replica = replica_set.choose()
+                if replica is not None:
+                    return replica.sync_engine
+        elif self._flushing or getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+            if self.info.get("principal") is not None:
+                recent_writers.set(self.info["principal"], True)
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+async_session = async_sessionmaker(
+    engine, expire_on_commit=False, sync_session_class=RoutingSession
+)
 
-engine = create_async_engine(settings.REAL_DATABASE_URL, future=True, echo=True)
 
-async_session = async_sessionmaker(engine, expire_on_commit=False)
+def get_session_factory() -> async_sessionmaker:
+    """For work that outlives the request, such as a streamed response body"""
+    return async_session
 
 
 async def get_db():
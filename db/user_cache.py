@@ -0,0 +1,261 @@
+"""Read-through cache of user rows for UserDAL.
+
+Rows are stored under ``id:<user_id>`` as compact tuples without the password
+hash; ``email:<lowercased email>`` only points to the user id, so invalidating
+a user by id also covers lookups by an email it no longer has. Misses are
+cached too, for a shorter TTL, and every TTL is shortened by a random jitter
+so entries filled together do not expire together.
+
+Every key also has a generation, replaced on each invalidation. A fill is
+tagged with the generation read before its query and only served while that
+generation is current, so a read that raced a write cannot keep the old row
+cached, whatever order the fill and the invalidation reach the backend in.
+A generation that is missing or expired matches no entry.
+
+The memory backend is per process, so other workers see a change only when
+their entry expires; the redis backend is shared and takes any client with
+redis GET/MGET/SET/DEL semantics (``redis.asyncio.Redis`` by default).
+"""
+import asyncio
+import json
+import random
+from uuid import UUID
+from uuid import uuid4
+
+import settings
+from cache import CACHE_HITS
+from cache import CACHE_MISSES
+from cache import TTLCache
+from db.models import User
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - optional dependency
+    redis_asyncio = None
+
+FIELDS = ("user_id", "name", "surname", "email", "is_active", "version")
+# cached "no such user"; also returned by get() for it, as opposed to NOT_CACHED
+MISSING = ()
+NOT_CACHED = None
+
+
+def _new_generation() -> str:
+    return uuid4().hex
+
+
+class MemoryBackend:
+    def __init__(self, max_size: int, max_ttl: float):
+        self._cache = TTLCache("user", max_size, max_ttl)
+        # outlive the entries tagged with them; a lost one only costs a miss
+        self._generations = TTLCache("user_generation", max_size, max_ttl * 2)
+
+    async def get(self, key: str) -> tuple | None:
+        tagged = self._cache.get(key)
+        if tagged is None or tagged[0] != self._generations.get(key):
+            return None
+        return tagged[1]
+
+    async def generation(self, key: str) -> str:
+        generation = self._generations.get(key)
+        if generation is None:
+            generation = _new_generation()
+            self._generations.set(key, generation)
+        return generation
+
+    async def set(self, key: str, entry: tuple, ttl: float, generation: str) -> None:
+        self._cache.set(key, (generation, entry), ttl)
+
+    async def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            self._generations.set(key, _new_generation())
+            self._cache.pop(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._generations.clear()
+
+
+class RedisBackend:
+    def __init__(self, client, max_ttl: float, prefix: str = "user:"):
+        self.client = client
+        self.prefix = prefix
+        self.generation_ttl = max(1, round(max_ttl * 2))
+        self._hits = CACHE_HITS.labels("user")
+        self._misses = CACHE_MISSES.labels("user")
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.prefix}gen:{key}"
+
+    async def get(self, key: str) -> tuple | None:
+        raw, generation = await self.client.mget(
+            self.prefix + key, self._generation_key(key)
+        )
+        tagged = None if raw is None else json.loads(raw)
+        if tagged is None or generation is None or tagged[0] != generation.decode():
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        entry = tagged[1:]
+        if entry:
+            entry[0] = UUID(entry[0])
+        return tuple(entry)
+
+    async def generation(self, key: str) -> str:
+        generation_key = self._generation_key(key)
+        generation = await self.client.get(generation_key)
+        if generation is None:
+            await self.client.set(
+                generation_key, _new_generation(), ex=self.generation_ttl, nx=True
+            )
+            # another worker may have set it first
+            generation = await self.client.get(generation_key)
+        return generation.decode()
+
+    async def set(self, key: str, entry: tuple, ttl: float, generation: str) -> None:
+        data = list(entry)
+        if data:
+            data[0] = str(data[0])
+        await self.client.set(
+            self.prefix + key, json.dumps([generation, *data]), ex=max(1, round(ttl))
+        )
+
+    async def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            await self.client.set(
+                self._generation_key(key), _new_generation(), ex=self.generation_ttl
+            )
+        await self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self) -> None:
+        pass
+
+
+def create_backend(kind: str):
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return MemoryBackend(
+            settings.USER_CACHE_MAX_SIZE, settings.USER_CACHE_TTL_SECONDS
+        )
+    if kind == "redis":
+        if redis_asyncio is None:
+            raise RuntimeError("The redis user cache backend needs the redis package")
+        return RedisBackend(
+            redis_asyncio.from_url(settings.USER_CACHE_REDIS_URL),
+            settings.USER_CACHE_TTL_SECONDS,
+        )
+    raise ValueError(f"Unknown user cache backend: {kind}")
+
+
+def _id_key(user_id: UUID) -> str:
+    return f"id:{user_id}"
+
+
+def _email_key(email: str) -> str:
+    return f"email:{email.lower()}"
+
+
+def _to_user(entry: tuple) -> User:
+    """Transient User without hashed_password"""
+    return User(**dict(zip(FIELDS, entry)))
+
+
+class UserCache:
+    def __init__(self, backend, ttl: float, negative_ttl: float, jitter: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.jitter = jitter
+        self._pending: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _jittered(self, ttl: float) -> float:
+        return ttl * (1 - self.jitter * random.random())
+
+    async def get_by_id(self, user_id: UUID) -> User | tuple | None:
+        """A transient User, MISSING for a cached miss, or NOT_CACHED"""
+        if self.backend is None:
+            return NOT_CACHED
+        entry = await self.backend.get(_id_key(user_id))
+        if entry is None or entry == MISSING:
+            return entry
+        return _to_user(entry)
+
+    async def get_by_email(self, email: str) -> User | tuple | None:
+        if self.backend is None:
+            return NOT_CACHED
+        pointer = await self.backend.get(_email_key(email))
+        if pointer is None or pointer == MISSING:
+            return pointer
+        user = await self.get_by_id(pointer[0])
+        # the user may have changed email since the pointer was stored
+        if not isinstance(user, User) or user.email.lower() != email.lower():
+            return NOT_CACHED
+        return user
+
+    async def id_generation(self, user_id: UUID) -> str | None:
+        """Take before reading the row that will fill the id entry"""
+        if self.backend is None:
+            return None
+        return await self.backend.generation(_id_key(user_id))
+
+    async def email_generation(self, email: str) -> str | None:
+        """Take before reading the row that will fill the email entry"""
+        if self.backend is None:
+            return None
+        return await self.backend.generation(_email_key(email))
+
+    async def set_user(self, user: User, generation: str) -> None:
+        if self.backend is None:
+            return
+        ttl = self._jittered(self.ttl)
+        entry = tuple(getattr(user, field) for field in FIELDS)
+        await self.backend.set(_id_key(user.user_id), entry, ttl, generation)
+        # a stale pointer is harmless, get_by_email checks the email it finds
+        await self.set_email_owner(
+            user.email, user.user_id, await self.email_generation(user.email)
+        )
+
+    async def set_email_owner(self, email: str, user_id: UUID, generation: str) -> None:
+        if self.backend is not None:
+            ttl = self._jittered(self.ttl)
+            await self.backend.set(_email_key(email), (user_id,), ttl, generation)
+
+    async def set_missing_id(self, user_id: UUID, generation: str) -> None:
+        if self.backend is not None:
+            ttl = self._jittered(self.negative_ttl)
+            await self.backend.set(_id_key(user_id), MISSING, ttl, generation)
+
+    async def set_missing_email(self, email: str, generation: str) -> None:
+        if self.backend is not None:
+            ttl = self._jittered(self.negative_ttl)
+            await self.backend.set(_email_key(email), MISSING, ttl, generation)
+
+    async def invalidate(self, user_ids=(), emails=()) -> None:
+        if self.backend is None:
+            return
+        keys = [_id_key(user_id) for user_id in user_ids]
+        keys += [_email_key(email) for email in emails]
+        if keys:
+            await self.backend.invalidate(*keys)
+
+    def invalidate_soon(self, user_ids=(), emails=()) -> None:
+        """Invalidate from synchronous code running on the event loop"""
+        task = asyncio.get_running_loop().create_task(self.invalidate(user_ids, emails))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+
+
+user_cache = UserCache(
+    create_backend(settings.USER_CACHE_BACKEND),
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    negative_ttl=settings.USER_CACHE_NEGATIVE_TTL_SECONDS,
+    jitter=settings.USER_CACHE_TTL_JITTER,
+)
@@ -1,13 +1,195 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+import settings
+from metrics import Counter
+from metrics import Gauge
+from metrics import Histogram
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    # any other cost, higher or lower, makes needs_update() true
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+HASHING_IN_FLIGHT = Gauge(
+    "hashing_in_flight", "Password hashing jobs running or waiting in the pool"
+)
+HASHING_QUEUE_DEPTH = Gauge(
+    "hashing_queue_depth", "Password hashing jobs waiting for a free worker"
+)
+HASHING_REJECTED = Counter(
+    "hashing_rejected_total", "Password hashing jobs rejected because the pool is full"
+)
+HASHING_LATENCY = Histogram(
+    "hashing_latency_seconds",
+    "Time from submitting a hashing job to getting its result",
+    labelnames=("operation",),
+)
+BCRYPT_DURATION = Histogram(
+    "bcrypt_duration_seconds",
+    "Time a worker spends in a single bcrypt call",
+    labelnames=("operation",),
+)
+
+
+class HasherBusyError(Exception):
+    """Raised when the hashing pool has no room for another job"""
+
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def calibrate_bcrypt_rounds(
+    target_seconds: float, min_rounds: int = 4, max_rounds: int = 20
+) -> int:
+    """Highest bcrypt cost whose verify takes at most ``target_seconds`` here"""
+    rounds = min_rounds
+    while rounds < max_rounds:
+        candidate = bcrypt.using(rounds=rounds + 1)
+        password_hash = candidate.hash("calibration")
+        started = time.perf_counter()
+        candidate.verify("calibration", password_hash)
+        if time.perf_counter() - started > target_seconds:
+            break
+        rounds += 1
+    return rounds
+
+
+def _timed_call(fn, *args) -> tuple:
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class HashingPool:
+    """Bounded executor for bcrypt.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more may
+    wait; anything beyond that fails fast with ``HasherBusyError``.
+    """
+
+    def __init__(self, executor_kind: str, max_workers: int, max_queue: int):
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"Unknown hashing executor: {executor_kind}")
+        self.executor_kind = executor_kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Executor | None = None
+        self._in_flight = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="hashing"
+                )
+        return self._executor
+
+    def _set_gauges(self) -> None:
+        HASHING_IN_FLIGHT.set(self._in_flight)
+        HASHING_QUEUE_DEPTH.set(max(self._in_flight - self.max_workers, 0))
+
+    async def _submit(self, operation: str, fn, *args):
+        self._in_flight += 1
+        self._set_gauges()
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(
+                self._get_executor(), _timed_call, fn, *args
+            )
+            BCRYPT_DURATION.labels(operation).observe(elapsed)
+            return result
+        finally:
+            self._in_flight -= 1
+            self._set_gauges()
+            HASHING_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+    def _admit(self, jobs: int = 1) -> None:
+        if self._in_flight + jobs > self.capacity:
+            HASHING_REJECTED.inc()
+            raise HasherBusyError("Password hashing pool is saturated")
+
+    async def run(self, operation: str, fn, *args):
+        self._admit()
+        return await self._submit(operation, fn, *args)
+
+    async def map(self, operation: str, fn, args_list: list[tuple]) -> list:
+        """Run a batch in chunks of max_workers jobs, each chunk admitted as that
+        many jobs, so a batch never holds more of the pool than it was admitted for"""
+        results = []
+        for start in range(0, len(args_list), self.max_workers):
+            chunk = args_list[start : start + self.max_workers]
+            self._admit(len(chunk))
+            results.extend(
+                await asyncio.gather(
+                    *(self._submit(operation, fn, *args) for args in chunk)
+                )
+            )
+        return results
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    settings.HASHING_EXECUTOR, settings.HASHING_MAX_WORKERS, settings.HASHING_MAX_QUEUE
+)
 
 
 class Hasher:
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+        return _verify_password(plain_password, hashed_password)
 
     @staticmethod
     def get_password_hash(password: str) -> str:
-        return pwd_context.hash(password)
+        return _get_password_hash(password)
+
+    @staticmethod
+    def needs_update(hashed_password: str) -> bool:
+        return pwd_context.needs_update(hashed_password)
+
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        return await hashing_pool.run(
+            "verify", _verify_password, plain_password, hashed_password
+        )
+
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        return await hashing_pool.run("hash", _get_password_hash, password)
+
+    @staticmethod
+    async def get_password_hashes_async(passwords: list[str]) -> list[str]:
+        return await hashing_pool.map(
+            "hash", _get_password_hash, [(password,) for password in passwords]
+        )
+
+
+if __name__ == "__main__":
+    rounds = calibrate_bcrypt_rounds(settings.BCRYPT_TARGET_VERIFY_MS / 1000)
+    print(f"BCRYPT_ROUNDS={rounds}")
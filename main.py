@@ -1,17 +1,53 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.routing import APIRouter
 
+import settings
 from api.handlers import user_router
+from api.jwks_handler import jwks_router
 from api.login_handler import login_router
+from api.metrics_handler import metrics_router
+from api.middleware import MetricsMiddleware
+from api.middleware import ProfilingMiddleware
+from api.middleware import QueryStatsMiddleware
+from db.session import replica_set
+from hashing import hashing_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    health_checks = None
+    if replica_set.engines:
+        health_checks = asyncio.create_task(
+            replica_set.run_health_checks(settings.DB_REPLICA_HEALTH_CHECK_INTERVAL)
+        )
+    yield
+    if health_checks is not None:
+        health_checks.cancel()
+    hashing_pool.shutdown()
+
 
-app = FastAPI(title="firstFastApiVideo")
+app = FastAPI(
+    title="firstFastApiVideo",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 main_api_router = APIRouter()
 
 main_api_router.include_router(user_router, prefix="/user", tags=["user"])
 main_api_router.include_router(login_router, prefix="/login", tags=["login"])
 app.include_router(main_api_router)
+app.include_router(metrics_router)
+app.include_router(jwks_router)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
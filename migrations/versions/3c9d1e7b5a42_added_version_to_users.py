@@ -0,0 +1,32 @@
+"""added version to users
+
+Revision ID: 3c9d1e7b5a42
+Revises: e37ec18a12e3
+Create Date: 2026-10-18 10:12:41.508213
+
+"""
+from typing import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9d1e7b5a42"
+down_revision: Union[str, None] = "e37ec18a12e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users", "version")
@@ -0,0 +1,84 @@
+"""Sampling profiler for a single request.
+
+A background thread samples the event loop thread every ``interval`` seconds.
+While the request is running on the loop its Python stack is recorded; while
+it is suspended (waiting on the database, the hashing pool, ...) the chain of
+coroutines it is awaiting is recorded instead, under an ``<awaiting>`` frame.
+The result is in the folded-stack format read by flamegraph.pl and speedscope.
+"""
+import asyncio
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({code.co_filename}:{frame.f_lineno})"
+
+
+def _awaited_frames(awaitable) -> list[FrameType]:
+    frames = []
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(
+            awaitable, "gi_frame", None
+        )
+        if frame is None:
+            break
+        frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(
+            awaitable, "gi_yieldfrom", None
+        )
+    return frames
+
+
+class RequestProfiler:
+    def __init__(self, root_frame: FrameType, interval: float):
+        self.root_frame = root_frame
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._thread_id = threading.get_ident()
+        self._task = asyncio.current_task()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            stack = self._running_stack()
+            if stack is None:
+                stack = self._awaiting_stack()
+            if stack:
+                self.samples[";".join(stack)] += 1
+
+    def _running_stack(self) -> list[str] | None:
+        frame = sys._current_frames().get(self._thread_id)
+        names = []
+        while frame is not None:
+            names.append(_frame_name(frame))
+            if frame is self.root_frame:
+                return names[::-1]
+            frame = frame.f_back
+        return None
+
+    def _awaiting_stack(self) -> list[str]:
+        if self._task is None:
+            return []
+        frames = _awaited_frames(self._task.get_coro())
+        for index, frame in enumerate(frames):
+            if frame is self.root_frame:
+                names = [_frame_name(frame) for frame in frames[index:]]
+                return [names[0], "<awaiting>", *names[1:]]
+        return []
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.items())
@@ -0,0 +1,127 @@
+"""Token buckets for throttling login attempts.
+
+Every key gets a bucket of ``capacity`` tokens refilled at ``rate`` tokens per
+second; an attempt takes one token and is rejected when the bucket is empty.
+The memory backend is per process; the redis backend shares buckets between
+workers and needs the optional ``redis`` package.
+"""
+import time
+from collections import OrderedDict
+
+from metrics import Counter
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - optional dependency
+    redis_asyncio = None
+
+LOGIN_RATE_LIMITED = Counter(
+    "login_rate_limited_total",
+    "Login attempts rejected by the rate limiter",
+    labelnames=("scope",),
+)
+
+
+class MemoryBackend:
+    """Buckets in a dict, least recently used ones dropped beyond ``max_keys``"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take a token; return 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisBackend:
+    """Buckets in redis hashes, updated atomically by a Lua script"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if redis_asyncio is None:
+            raise RuntimeError("The redis rate limit backend needs the redis package")
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        retry_after = await self._take(keys=[self.prefix + key], args=[capacity, rate])
+        return float(retry_after)
+
+    def clear(self) -> None:
+        pass
+
+
+def create_backend(kind: str, redis_url: str, max_keys: int):
+    if kind == "memory":
+        return MemoryBackend(max_keys)
+    if kind == "redis":
+        return RedisBackend(redis_url)
+    raise ValueError(f"Unknown rate limit backend: {kind}")
+
+
+class LoginRateLimiter:
+    """Per-email and per-client-IP buckets checked before a password is verified"""
+
+    def __init__(
+        self,
+        backend,
+        email_burst: int,
+        email_per_minute: float,
+        ip_burst: int,
+        ip_per_minute: float,
+    ):
+        self.backend = backend
+        self.limits = {
+            "email": (email_burst, email_per_minute / 60),
+            "ip": (ip_burst, ip_per_minute / 60),
+        }
+
+    async def check(self, email: str, client_ip: str | None) -> float:
+        """Return 0 if the attempt may proceed, else seconds to wait"""
+        keys = {"email": email.lower(), "ip": client_ip}
+        for scope, key in keys.items():
+            if key is None:
+                continue
+            capacity, rate = self.limits[scope]
+            retry_after = await self.backend.take(f"{scope}:{key}", capacity, rate)
+            if retry_after:
+                LOGIN_RATE_LIMITED.labels(scope).inc()
+                return retry_after
+        return 0.0
@@ -0,0 +1,189 @@
+"""Revoked access and refresh tokens.
+
+Single tokens are revoked by ``jti`` until their ``exp``; a subject (user id)
+is revoked by remembering a cut-off, so every token it was issued up to then
+is rejected. The memory backend answers most lookups from a Bloom filter and
+keeps 16-byte digests of revoked jtis behind it. The redis backend shares
+revocations between workers and needs the optional ``redis`` package.
+"""
+import hashlib
+import math
+import time
+
+import settings
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - optional dependency
+    redis_asyncio = None
+
+
+def _digest(jti: str) -> bytes:
+    return hashlib.blake2b(jti.encode(), digest_size=16).digest()
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: bytes):
+        # key is already a uniform digest, so its halves serve as two hashes
+        first = int.from_bytes(key[:8], "big")
+        second = int.from_bytes(key[8:16], "big") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: bytes) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class MemoryBackend:
+    """Per-process revocations; expired entries are pruned at most once a minute"""
+
+    prune_interval = 60
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.clear()
+
+    def clear(self) -> None:
+        self._tokens: dict[bytes, float] = {}
+        self._subjects: dict[str, tuple[float, float]] = {}
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        self._pruned_at = time.time()
+
+    def _prune(self, now: float) -> None:
+        if now - self._pruned_at < self.prune_interval:
+            return
+        self._pruned_at = now
+        self._tokens = {key: exp for key, exp in self._tokens.items() if exp > now}
+        self._subjects = {
+            subject: entry
+            for subject, entry in self._subjects.items()
+            if entry[1] > now
+        }
+        # a Bloom filter cannot forget, so it is rebuilt from what is left
+        self._bloom = BloomFilter(
+            max(self.capacity, len(self._tokens)), self.error_rate
+        )
+        for key in self._tokens:
+            self._bloom.add(key)
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        now = time.time()
+        self._prune(now)
+        if expires_at <= now:
+            return
+        key = _digest(jti)
+        self._tokens[key] = expires_at
+        self._bloom.add(key)
+
+    async def revoke_subject(
+        self, subject: str, issued_before: float, ttl: float
+    ) -> None:
+        self._prune(time.time())
+        self._subjects[subject] = (issued_before, time.time() + ttl)
+
+    async def is_revoked(
+        self, jti: str | None, subject: str | None, issued_at: float
+    ) -> bool:
+        now = time.time()
+        if jti is not None:
+            key = _digest(jti)
+            if key in self._bloom and self._tokens.get(key, 0) > now:
+                return True
+        if subject is not None:
+            entry = self._subjects.get(subject)
+            if entry is not None and entry[1] > now and issued_at <= entry[0]:
+                return True
+        return False
+
+
+class RedisBackend:
+    """Revocations as redis keys that expire together with the tokens"""
+
+    def __init__(self, url: str, prefix: str = "revoked:"):
+        if redis_asyncio is None:
+            raise RuntimeError("The redis revocation backend needs the redis package")
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        ttl = math.ceil(expires_at - time.time())
+        if ttl > 0:
+            await self._client.set(f"{self.prefix}jti:{jti}", 1, ex=ttl)
+
+    async def revoke_subject(
+        self, subject: str, issued_before: float, ttl: float
+    ) -> None:
+        await self._client.set(
+            f"{self.prefix}sub:{subject}", issued_before, ex=math.ceil(ttl)
+        )
+
+    async def is_revoked(
+        self, jti: str | None, subject: str | None, issued_at: float
+    ) -> bool:
+        keys = []
+        if jti is not None:
+            keys.append(f"{self.prefix}jti:{jti}")
+        if subject is not None:
+            keys.append(f"{self.prefix}sub:{subject}")
+        if not keys:
+            return False
+        values = dict(zip(keys, await self._client.mget(keys)))
+        if values.get(f"{self.prefix}jti:{jti}") is not None:
+            return True
+        issued_before = values.get(f"{self.prefix}sub:{subject}")
+        return issued_before is not None and issued_at <= float(issued_before)
+
+    def clear(self) -> None:
+        pass
+
+
+def create_backend(kind: str, redis_url: str):
+    if kind == "memory":
+        return MemoryBackend(
+            settings.REVOCATION_BLOOM_CAPACITY, settings.REVOCATION_BLOOM_ERROR_RATE
+        )
+    if kind == "redis":
+        return RedisBackend(redis_url)
+    raise ValueError(f"Unknown revocation backend: {kind}")
+
+
+class TokenRevocations:
+    """Revocation checks on decoded token payloads"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def revoke_token(self, payload: dict) -> None:
+        if payload.get("jti") is not None and payload.get("exp") is not None:
+            await self.backend.revoke(payload["jti"], payload["exp"])
+
+    async def revoke_subject(self, subject: str) -> None:
+        """Reject every token issued to ``subject`` until now"""
+        ttl = max(
+            settings.ACCESS_TOKEN_EXPIRE_MINUTES, settings.REFRESH_TOKEN_EXPIRE_MINUTES
+        )
+        await self.backend.revoke_subject(subject, time.time(), ttl * 60)
+
+    async def is_revoked(self, payload: dict) -> bool:
+        return await self.backend.is_revoked(
+            payload.get("jti"), payload.get("user_id"), payload.get("iat", 0)
+        )
+
+
+token_revocations = TokenRevocations(
+    create_backend(settings.REVOCATION_BACKEND, settings.REVOCATION_REDIS_URL)
+)
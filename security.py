@@ -1,11 +1,18 @@
+import hashlib
+import time
+import uuid
 from datetime import datetime
 from datetime import timedelta
 from datetime import UTC
 from typing import Optional
 
-from jose import jwt
-
 import settings
+from cache import TTLCache
+from signing import signer
+
+token_cache = TTLCache(
+    "jwt", settings.JWT_CACHE_MAX_SIZE, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -16,8 +23,30 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.now(UTC) + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
-    )
+    to_encode.update({"exp": expire, "iat": datetime.now(UTC), "jti": uuid.uuid4().hex})
+    encoded_jwt = signer.encode(to_encode)
     return encoded_jwt
+
+
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    return create_access_token(
+        {**data, "type": "refresh"},
+        expires_delta or timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES),
+    )
+
+
+def decode_access_token(token: str) -> dict:
+    """Verify a token and return its claims, reusing earlier verifications.
+
+    Raises JWTError for invalid tokens, which are never cached. A cached
+    payload is dropped when the token's ``exp`` passes. The returned dict is
+    shared between callers and must not be modified.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+    payload = signer.decode(token)
+    exp = payload.get("exp")
+    token_cache.set(key, payload, ttl=None if exp is None else exp - time.time())
+    return payload
@@ -0,0 +1,173 @@
+"""JWT signing behind one interface, with keys parsed once.
+
+A key ring maps ``kid`` to key material: an HMAC secret, or a PEM private key
+for RS256/ES256/EdDSA. The active kid signs and goes into the token header;
+every kid in the ring verifies, so a key is rotated by adding the new one,
+switching the active kid and dropping the old one once its tokens expire.
+
+``JoseSigner`` uses python-jose. ``PyJWTSigner`` uses the optional PyJWT
+package (with ``cryptography``), which also supports EdDSA; compare them with
+``python -m benchmarks.signing``. Both raise ``jose.JWTError`` for invalid tokens.
+"""
+import os
+
+from jose import jwk
+from jose import jwt as jose_jwt
+from jose import JWTError
+
+import settings
+
+try:
+    import jwt as pyjwt
+except ImportError:  # pragma: no cover - optional dependency
+    pyjwt = None
+
+HMAC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+
+
+def load_keys(keys_dir: str, secret_key: str, active_kid: str) -> dict[str, bytes]:
+    """Key material by kid: every ``<kid>.pem`` in ``keys_dir``, else the secret"""
+    if not keys_dir:
+        return {active_kid: secret_key.encode()}
+    keys = {}
+    for filename in sorted(os.listdir(keys_dir)):
+        kid, extension = os.path.splitext(filename)
+        if extension == ".pem":
+            with open(os.path.join(keys_dir, filename), "rb") as f:
+                keys[kid] = f.read()
+    if active_kid not in keys:
+        raise ValueError(f"No key for JWT_ACTIVE_KID {active_kid!r} in {keys_dir}")
+    return keys
+
+
+class _Signer:
+    def __init__(self, algorithm: str, keys: dict[str, bytes], active_kid: str):
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        self.headers = {"kid": active_kid}
+        self._signing_key = None
+        self._verify_keys = {}
+        for kid, material in keys.items():
+            private_key, public_key = self._parse(material)
+            if kid == active_kid:
+                self._signing_key = private_key
+            self._verify_keys[kid] = public_key
+
+    @property
+    def is_symmetric(self) -> bool:
+        return self.algorithm in HMAC_ALGORITHMS
+
+    def _verify_key(self, kid: str | None):
+        # tokens issued before kids were introduced carry none
+        key = self._verify_keys.get(kid or self.active_kid)
+        if key is None:
+            raise JWTError(f"Unknown key id: {kid}")
+        return key
+
+    def jwks(self) -> dict:
+        """Public keys as a JWK Set; empty for HMAC, whose keys are secret"""
+        if self.is_symmetric:
+            return {"keys": []}
+        return {
+            "keys": [
+                {
+                    **self._public_jwk(key),
+                    "kid": kid,
+                    "alg": self.algorithm,
+                    "use": "sig",
+                }
+                for kid, key in self._verify_keys.items()
+            ]
+        }
+
+    def _parse(self, material: bytes) -> tuple:
+        raise NotImplementedError
+
+    def _public_jwk(self, key) -> dict:
+        raise NotImplementedError
+
+    def encode(self, claims: dict) -> str:
+        raise NotImplementedError
+
+    def decode(self, token: str) -> dict:
+        raise NotImplementedError
+
+
+class JoseSigner(_Signer):
+    def _parse(self, material: bytes) -> tuple:
+        if self.algorithm == "EdDSA":
+            raise ValueError(
+                "python-jose does not support EdDSA, use JWT_BACKEND=pyjwt"
+            )
+        key = jwk.construct(material, self.algorithm)
+        if self.is_symmetric:
+            return key, key
+        return key, key.public_key()
+
+    def _public_jwk(self, key) -> dict:
+        return key.to_dict()
+
+    def encode(self, claims: dict) -> str:
+        return jose_jwt.encode(
+            claims, self._signing_key, algorithm=self.algorithm, headers=self.headers
+        )
+
+    def decode(self, token: str) -> dict:
+        kid = jose_jwt.get_unverified_header(token).get("kid")
+        return jose_jwt.decode(
+            token, self._verify_key(kid), algorithms=[self.algorithm]
+        )
+
+
+class PyJWTSigner(_Signer):
+    def __init__(self, algorithm: str, keys: dict[str, bytes], active_kid: str):
+        if pyjwt is None:
+            raise RuntimeError("JWT_BACKEND=pyjwt needs the PyJWT package")
+        self._algorithm = pyjwt.get_algorithm_by_name(algorithm)
+        super().__init__(algorithm, keys, active_kid)
+
+    def _parse(self, material: bytes) -> tuple:
+        key = self._algorithm.prepare_key(material)
+        if self.is_symmetric:
+            return key, key
+        return key, key.public_key()
+
+    def _public_jwk(self, key) -> dict:
+        return self._algorithm.to_jwk(key, as_dict=True)
+
+    def encode(self, claims: dict) -> str:
+        return pyjwt.encode(
+            claims, self._signing_key, algorithm=self.algorithm, headers=self.headers
+        )
+
+    def decode(self, token: str) -> dict:
+        try:
+            kid = pyjwt.get_unverified_header(token).get("kid")
+            return pyjwt.decode(
+                token,
+                self._verify_key(kid),
+                algorithms=[self.algorithm],
+                # claims are checked by the callers, as with python-jose
+                options={"verify_sub": False, "verify_jti": False},
+            )
+        except pyjwt.PyJWTError as e:
+            raise JWTError(str(e)) from e
+
+
+SIGNERS = {"jose": JoseSigner, "pyjwt": PyJWTSigner}
+
+
+def create_signer(
+    backend: str, algorithm: str, keys: dict[str, bytes], active_kid: str
+):
+    if backend not in SIGNERS:
+        raise ValueError(f"Unknown JWT backend: {backend}")
+    return SIGNERS[backend](algorithm, keys, active_kid)
+
+
+signer = create_signer(
+    settings.JWT_BACKEND,
+    settings.ALGORITHM,
+    load_keys(settings.JWT_KEYS_DIR, settings.SECRET_KEY, settings.JWT_ACTIVE_KID),
+    settings.JWT_ACTIVE_KID,
+)
@@ -0,0 +1,60 @@
+"""Coalescing of concurrent identical calls.
+
+While a call for a key is in flight, later calls with the same key wait for
+its result instead of running again. Nothing is cached once the call ends.
+The call runs in the first caller's task with that caller's arguments (a DAL
+call uses its session), so if that caller is cancelled the waiters do not
+inherit the cancellation: they run the call again, each with its own arguments.
+"""
+import asyncio
+from typing import Hashable
+
+from metrics import Counter
+
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Calls that ran because none was in flight for their key",
+    labelnames=("name",),
+)
+SINGLEFLIGHT_COALESCED = Counter(
+    "singleflight_coalesced_total",
+    "Calls that shared the result of one already in flight",
+    labelnames=("name",),
+)
+
+# result handed to waiters when the caller running the call was cancelled
+_RETRY = object()
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self._calls = SINGLEFLIGHT_CALLS.labels(name)
+        self._coalesced = SINGLEFLIGHT_COALESCED.labels(name)
+
+    async def do(self, key: Hashable, fn, *args):
+        while (future := self._in_flight.get(key)) is not None:
+            self._coalesced.inc()
+            # a cancelled waiter must not cancel the shared call
+            result = await asyncio.shield(future)
+            if result is not _RETRY:
+                return result
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self._calls.inc()
+        try:
+            result = await fn(*args)
+        except asyncio.CancelledError:
+            future.set_result(_RETRY)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark it retrieved, there may be nobody else waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
@@ -3,6 +3,7 @@ import os
 from datetime import timedelta
 from typing import Any
 from typing import AsyncGenerator
+from uuid import UUID
 
 import pytest
 from sqlalchemy import text
@@ -11,9 +12,17 @@ from sqlalchemy.ext.asyncio import create_async_engine
 from starlette.testclient import TestClient
 
 import settings
+from api.actions.auth import login_rate_limiter
+from api.actions.auth import principal_cache
+from api.actions.auth import unknown_emails
+from db.session import create_engine
+from db.user_cache import user_cache
 from db.session import get_db
+from db.session import get_session_factory
 from main import app
+from revocation import token_revocations
 from security import create_access_token
+from security import token_cache
 
 CLEAN_TABLES = [
     "users",
@@ -49,14 +58,18 @@ async def clean_tables(async_session_test):
         async with session.begin():
             for table_for_cleaning in CLEAN_TABLES:
                 await session.execute(text(f"""TRUNCATE TABLE {table_for_cleaning};"""))
+    principal_cache.clear()
+    token_cache.clear()
+    unknown_emails.clear()
+    login_rate_limiter.backend.clear()
+    token_revocations.backend.clear()
+    user_cache.clear()
 
 
 async def _get_test_db():
     try:
         # create async engine for interaction with database
-        test_engine = create_async_engine(
-            settings.TEST_DATABASE_URL, future=True, echo=False
-        )
+        test_engine = create_engine(settings.TEST_DATABASE_URL, name="test")
 
         # create session for the interaction with database
         test_async_session = async_sessionmaker(test_engine, expire_on_commit=False)
@@ -65,6 +78,11 @@ async def _get_test_db():
         pass
 
 
+def _get_test_session_factory():
+    test_engine = create_engine(settings.TEST_DATABASE_URL, name="test")
+    return async_sessionmaker(test_engine, expire_on_commit=False)
+
+
 @pytest.fixture(scope="function")
 async def client() -> AsyncGenerator[TestClient, Any]:
     """
@@ -72,6 +90,7 @@ async def client() -> AsyncGenerator[TestClient, Any]:
     the `get_db` dependency that is injected into routes.
     """
     app.dependency_overrides[get_db] = _get_test_db
+    app.dependency_overrides[get_session_factory] = _get_test_session_factory
     with TestClient(app) as client:
         yield client
 
@@ -121,9 +140,9 @@ async def create_user_in_database(async_session_test):
     return create_user_in_database
 
 
-def create_test_auth_headers_for_user(email: str) -> dict[str, str]:
+def create_test_auth_headers_for_user(email: str, user_id: UUID) -> dict[str, str]:
     access_token = create_access_token(
-        data={"sub": email},
+        data={"sub": email, "user_id": str(user_id)},
         expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
     )
     return {"Authorization": f"Bearer {access_token}"}
@@ -0,0 +1,68 @@
+"""case-insensitive unique email for active users
+
+Revision ID: 4d2a6e8f1b57
+Revises: b81f4a2c9d60
+Create Date: 2026-10-18 18:02:17.384105
+
+Replaces the unique constraint on email with a unique index on lower(email)
+limited to active users, so lookups are case-insensitive and deactivated users
+no longer reserve their email, and adds a partial index on active users.
+The indexes are built with CREATE INDEX CONCURRENTLY outside of a transaction
+so the table stays writable. If active users already share an email up to
+case, the unique index build fails and leaves an invalid index behind. The
+indexes are created without IF NOT EXISTS, so a retry fails on that leftover
+instead of skipping it and dropping the constraint with no valid index in its
+place: resolve the duplicates, drop the indexes the failed run created and
+run the upgrade again.
+"""
+from typing import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4d2a6e8f1b57"
+down_revision: Union[str, None] = "b81f4a2c9d60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_email_lower_active",
+            "users",
+            [sa.text("lower(email)")],
+            unique=True,
+            postgresql_where=sa.text("is_active"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_users_active_user_id",
+            "users",
+            ["user_id"],
+            postgresql_where=sa.text("is_active"),
+            postgresql_concurrently=True,
+        )
+    op.drop_constraint("users_email_key", "users", type_="unique")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_unique_constraint("users_email_key", "users", ["email"])
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_users_active_user_id",
+            table_name="users",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_users_email_lower_active",
+            table_name="users",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,32 @@
+"""added version to users
+
+Revision ID: b81f4a2c9d60
+Revises: f62925e3921d
+Create Date: 2026-10-18 10:12:41.508213
+
+"""
+from typing import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b81f4a2c9d60"
+down_revision: Union[str, None] = "f62925e3921d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users", "version")
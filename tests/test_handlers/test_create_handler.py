@@ -1,7 +1,10 @@
 import json
+from uuid import uuid4
 
 import pytest
 
+from tests.conftest import create_test_auth_headers_for_user
+
 
 async def test_create_user(client, get_user_from_database):
     user_data = {
@@ -57,7 +60,10 @@ async def test_create_user_duplicate_email_error(client, get_user_from_database)
     assert str(user_from_db["user_id"]) == data_from_resp["user_id"]
     resp = client.post("/user/", data=json.dumps(user_data_same))
     assert resp.status_code == 503
-    assert 'ограничение уникальности "users_email_key"' in resp.json()["detail"]
+    assert (
+        'ограничение уникальности "ix_users_email_lower_active"'
+        in resp.json()["detail"]
+    )
 
 
 @pytest.mark.parametrize(
@@ -169,3 +175,61 @@ async def test_create_user_validation_error(
     data_from_resp = resp.json()
     assert resp.status_code == expected_status_code
     assert data_from_resp == expected_detail
+
+
+async def test_create_users_batch(client, create_user_in_database):
+    existing_user = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": "<PASSWORD>",
+    }
+    await create_user_in_database(**existing_user)
+    users = [
+        {"name": "Ivan", "surname": "Ivanov", "email": "ivan@kek.com"},
+        {"name": "Petr", "surname": "Petrov", "email": "lol@kek.com"},
+        {"name": "Anna", "surname": "Ivanova", "email": "ivan@kek.com"},
+        {"name": "Olga", "surname": "Petrova", "email": "olga@kek.com"},
+    ]
+    resp = client.post(
+        "/user/batch",
+        data=json.dumps(
+            {"users": [{**user, "password": "<PASSWORD>"} for user in users]}
+        ),
+        headers=create_test_auth_headers_for_user(
+            existing_user["email"], existing_user["user_id"]
+        ),
+    )
+    assert resp.status_code == 200
+    data_from_resp = resp.json()
+    assert data_from_resp["created"] == 2
+    assert data_from_resp["duplicates"] == 2
+    statuses = [result["status"] for result in data_from_resp["results"]]
+    assert statuses == ["created", "duplicate", "duplicate", "created"]
+    created = data_from_resp["results"][0]["user"]
+    assert created["name"] == "Ivan"
+    assert created["email"] == "ivan@kek.com"
+    assert created["is_active"] is True
+    assert data_from_resp["results"][1]["user"] is None
+
+
+async def test_create_user_email_is_unique_among_active_users_in_any_case(
+    client, create_user_in_database
+):
+    for email, is_active in (("lol@kek.com", True), ("old@kek.com", False)):
+        await create_user_in_database(
+            user_id=uuid4(),
+            name="Nikolai",
+            surname="Sviridov",
+            email=email,
+            is_active=is_active,
+            hashed_password="<PASSWORD>",
+        )
+    user_data = {"name": "Petr", "surname": "Petrov", "password": "<PASSWORD>"}
+    resp = client.post("/user/", data=json.dumps({**user_data, "email": "LOL@kek.com"}))
+    assert resp.status_code == 503
+    resp = client.post("/user/", data=json.dumps({**user_data, "email": "Old@kek.com"}))
+    assert resp.status_code == 200
+    assert resp.json()["email"] == "Old@kek.com"
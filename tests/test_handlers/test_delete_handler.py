@@ -15,7 +15,9 @@ async def test_delete_user(client, create_user_in_database, get_user_from_databa
     await create_user_in_database(**user_data)
     resp = client.delete(
         f"/user/?user_id={user_data['user_id']}",
-        headers=create_test_auth_headers_for_user(user_data["email"]),
+        headers=create_test_auth_headers_for_user(
+            user_data["email"], user_data["user_id"]
+        ),
     )
     assert resp.status_code == 200
     assert resp.json() == {"deleted_user_id": str(user_data["user_id"])}
@@ -41,7 +43,9 @@ async def test_delete_user_not_found(client, create_user_in_database):
     user_id = uuid4()
     resp = client.delete(
         f"/user/?user_id={user_id}",
-        headers=create_test_auth_headers_for_user(user_data["email"]),
+        headers=create_test_auth_headers_for_user(
+            user_data["email"], user_data["user_id"]
+        ),
     )
     assert resp.status_code == 404
     assert resp.json() == {"detail": f"User with id {user_id} not found."}
@@ -58,7 +62,9 @@ async def test_delete_user_user_id_validation_error(client):
     }
     resp = client.delete(
         "/user/?user_id=123",
-        headers=create_test_auth_headers_for_user(user_data["email"]),
+        headers=create_test_auth_headers_for_user(
+            user_data["email"], user_data["user_id"]
+        ),
     )
     assert resp.status_code == 422
     data_from_response = resp.json()
@@ -90,7 +96,41 @@ async def test_delete_user_not_auth(client, create_user_in_database):
     user_id = uuid4()
     resp = client.delete(
         f"/user/?user_id={user_id}",
-        headers=create_test_auth_headers_for_user(user_data["email"] + "a"),
+        headers=create_test_auth_headers_for_user(user_data["email"] + "a", uuid4()),
     )
     assert resp.status_code == 401
     assert resp.json() == {"detail": "Could not validate credentials"}
+
+
+async def test_deactivate_users_batch(
+    client, create_user_in_database, get_user_from_database
+):
+    user_ids = [uuid4(), uuid4()]
+    for index, user_id in enumerate(user_ids):
+        await create_user_in_database(
+            user_id=user_id,
+            name="Nikolai",
+            surname="Sviridov",
+            email=f"lol{index}@kek.com",
+            is_active=True,
+            hashed_password="<PASSWORD>",
+        )
+    missing_user_id = uuid4()
+    resp = client.post(
+        "/user/batch/deactivate",
+        json={"user_ids": [str(user_ids[1]), str(missing_user_id)]},
+        headers=create_test_auth_headers_for_user("lol0@kek.com", user_ids[0]),
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "deactivated": 1,
+        "not_found": 1,
+        "results": [
+            {"user_id": str(user_ids[1]), "status": "deactivated"},
+            {"user_id": str(missing_user_id), "status": "not_found"},
+        ],
+    }
+    users_from_db = await get_user_from_database(user_ids[1])
+    assert users_from_db[0]["is_active"] is False
+    users_from_db = await get_user_from_database(user_ids[0])
+    assert users_from_db[0]["is_active"] is True
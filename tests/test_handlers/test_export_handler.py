@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+from uuid import uuid4
+
+from tests.conftest import create_test_auth_headers_for_user
+
+
+async def _create_users(create_user_in_database):
+    users = [
+        {
+            "user_id": uuid4(),
+            "name": "Nikolai",
+            "surname": "Sviridov",
+            "email": f"lol{i}@kek.com",
+            "is_active": True,
+            "hashed_password": "<PASSWORD>",
+        }
+        for i in range(3)
+    ]
+    for user_data in users:
+        await create_user_in_database(**user_data)
+    return sorted(users, key=lambda user: str(user["user_id"]))
+
+
+async def test_export_users_ndjson(client, create_user_in_database):
+    users = await _create_users(create_user_in_database)
+    resp = client.get(
+        "/user/export",
+        headers=create_test_auth_headers_for_user(
+            users[0]["email"], users[0]["user_id"]
+        ),
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [row["user_id"] for row in rows] == [str(u["user_id"]) for u in users]
+    assert rows[0] == {
+        "user_id": str(users[0]["user_id"]),
+        "name": users[0]["name"],
+        "surname": users[0]["surname"],
+        "email": users[0]["email"],
+        "is_active": True,
+    }
+
+
+async def test_export_users_csv_gzip(client, create_user_in_database):
+    users = await _create_users(create_user_in_database)
+    resp = client.get(
+        "/user/export?format=csv&gzip=true",
+        headers=create_test_auth_headers_for_user(
+            users[0]["email"], users[0]["user_id"]
+        ),
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0] == ["user_id", "name", "surname", "email", "is_active"]
+    assert [row[0] for row in rows[1:]] == [str(u["user_id"]) for u in users]
@@ -1,5 +1,8 @@
 from uuid import uuid4
 
+import settings
+from tests.conftest import create_test_auth_headers_for_user
+
 
 async def test_get_user(client, create_user_in_database, get_user_from_database):
     user_data = {
@@ -69,3 +72,65 @@ async def test_get_user_not_found(
     resp = client.get(f"/user/?user_id={user_id_for_finding}")
     assert resp.status_code == 404
     assert resp.json() == {"detail": f"User with id {user_id_for_finding} not found."}
+
+
+async def test_get_user_etag_not_modified(client, create_user_in_database):
+    user_data = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": "<PASSWORD>",
+    }
+    await create_user_in_database(**user_data)
+    headers = create_test_auth_headers_for_user(
+        user_data["email"], user_data["user_id"]
+    )
+    resp = client.get(f"/user/?user_id={user_data['user_id']}", headers=headers)
+    assert resp.status_code == 200
+    assert "version" not in resp.json()
+    etag = resp.headers["etag"]
+    assert etag == '"1"'
+    assert resp.headers["cache-control"] == "private, no-cache"
+
+    resp = client.get(
+        f"/user/?user_id={user_data['user_id']}",
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
+
+    resp = client.get(
+        f"/user/?user_id={user_data['user_id']}",
+        headers={**headers, "If-None-Match": '"0"'},
+    )
+    assert resp.status_code == 200
+
+
+async def test_get_user_is_cached_and_invalidated_on_update(
+    client, create_user_in_database, monkeypatch
+):
+    monkeypatch.setattr(settings, "DEBUG", True)
+    user_data = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": "<PASSWORD>",
+    }
+    await create_user_in_database(**user_data)
+    headers = create_test_auth_headers_for_user(
+        user_data["email"], user_data["user_id"]
+    )
+    url = f"/user/?user_id={user_data['user_id']}"
+    assert client.get(url, headers=headers).status_code == 200
+    resp = client.get(url, headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["x-db-query-count"] == "0"
+    resp = client.patch(url, json={"name": "Ivan"}, headers=headers)
+    assert resp.status_code == 200
+    resp = client.get(url, headers=headers)
+    assert resp.json()["name"] == "Ivan"
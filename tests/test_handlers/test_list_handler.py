@@ -0,0 +1,62 @@
+from uuid import uuid4
+
+from tests.conftest import create_test_auth_headers_for_user
+
+
+async def test_list_users_paginates_with_cursor(client, create_user_in_database):
+    users = [
+        {
+            "user_id": uuid4(),
+            "name": "Nikolai",
+            "surname": "Sviridov",
+            "email": f"lol{i}@kek.com",
+            "is_active": i != 0,
+            "hashed_password": "<PASSWORD>",
+        }
+        for i in range(5)
+    ]
+    for user_data in users:
+        await create_user_in_database(**user_data)
+    headers = create_test_auth_headers_for_user(users[1]["email"], users[1]["user_id"])
+
+    seen_ids = []
+    cursor = None
+    while True:
+        url = "/user/list?limit=2"
+        if cursor:
+            url += f"&cursor={cursor}"
+        resp = client.get(url, headers=headers)
+        assert resp.status_code == 200
+        data_from_resp = resp.json()
+        assert len(data_from_resp["users"]) <= 2
+        seen_ids.extend(user["user_id"] for user in data_from_resp["users"])
+        cursor = data_from_resp["next_cursor"]
+        if cursor is None:
+            break
+    assert seen_ids == sorted(str(user["user_id"]) for user in users)
+
+    resp = client.get("/user/list?is_active=false", headers=headers)
+    assert resp.status_code == 200
+    assert [user["user_id"] for user in resp.json()["users"]] == [
+        str(users[0]["user_id"])
+    ]
+
+
+async def test_list_users_invalid_cursor(client, create_user_in_database):
+    user_data = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": "<PASSWORD>",
+    }
+    await create_user_in_database(**user_data)
+    resp = client.get(
+        "/user/list?cursor=!!!",
+        headers=create_test_auth_headers_for_user(
+            user_data["email"], user_data["user_id"]
+        ),
+    )
+    assert resp.status_code == 422
+    assert resp.json() == {"detail": "Invalid cursor: !!!"}
@@ -0,0 +1,178 @@
+from uuid import uuid4
+
+from passlib.hash import bcrypt
+
+import settings
+from hashing import Hasher
+from revocation import token_revocations
+from security import create_access_token
+from security import decode_access_token
+
+
+async def test_login_rehashes_outdated_hash(
+    client, create_user_in_database, get_user_from_database
+):
+    outdated_hash = bcrypt.using(rounds=4).hash("<PASSWORD>")
+    user_data = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": outdated_hash,
+    }
+    await create_user_in_database(**user_data)
+    resp = client.post(
+        "/login/token", data={"username": "lol@kek.com", "password": "<PASSWORD>"}
+    )
+    assert resp.status_code == 200
+    users_from_db = await get_user_from_database(user_data["user_id"])
+    new_hash = users_from_db[0]["hashed_password"]
+    assert new_hash != outdated_hash
+    assert bcrypt.from_string(new_hash).rounds == settings.BCRYPT_ROUNDS
+    assert bcrypt.verify("<PASSWORD>", new_hash)
+
+
+async def test_login_is_rate_limited_per_email(client):
+    for _ in range(settings.LOGIN_RATE_LIMIT_EMAIL_BURST):
+        resp = client.post(
+            "/login/token", data={"username": "lol@kek.com", "password": "wrong"}
+        )
+        assert resp.status_code == 401
+    resp = client.post(
+        "/login/token", data={"username": "lol@kek.com", "password": "wrong"}
+    )
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) >= 1
+
+
+async def test_unknown_email_skips_database_on_retry(client, monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", True)
+    data = {"username": "nobody@kek.com", "password": "wrong"}
+    resp = client.post("/login/token", data=data)
+    assert resp.status_code == 401
+    assert int(resp.headers["x-db-query-count"]) >= 1
+    resp = client.post("/login/token", data=data)
+    assert resp.status_code == 401
+    assert resp.headers["x-db-query-count"] == "0"
+
+
+async def _login(client, create_user_in_database) -> dict:
+    user_data = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": Hasher.get_password_hash("<PASSWORD>"),
+    }
+    await create_user_in_database(**user_data)
+    resp = client.post(
+        "/login/token", data={"username": "lol@kek.com", "password": "<PASSWORD>"}
+    )
+    assert resp.status_code == 200
+    return {"user_id": user_data["user_id"], **resp.json()}
+
+
+async def _login_stateless(client, create_user_in_database, monkeypatch) -> dict:
+    monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+    monkeypatch.setattr(settings, "DEBUG", True)
+    return await _login(client, create_user_in_database)
+
+
+async def test_stateless_token_authorizes_without_user_lookup(
+    client, create_user_in_database, monkeypatch
+):
+    tokens = await _login_stateless(client, create_user_in_database, monkeypatch)
+    assert tokens["refresh_token"]
+    resp = client.get(
+        f"/user/?user_id={tokens['user_id']}",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert resp.status_code == 200
+    # only the handler's own SELECT, no lookup of the caller
+    assert resp.headers["x-db-query-count"] == "1"
+
+
+async def test_refresh_issues_new_tokens(client, create_user_in_database, monkeypatch):
+    tokens = await _login_stateless(client, create_user_in_database, monkeypatch)
+    resp = client.post(
+        "/login/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert resp.status_code == 200
+    assert resp.json()["access_token"]
+    resp = client.post("/login/refresh", json={"refresh_token": tokens["access_token"]})
+    assert resp.status_code == 401
+    resp = client.get(
+        f"/user/?user_id={tokens['user_id']}",
+        headers={"Authorization": f"Bearer {tokens['refresh_token']}"},
+    )
+    assert resp.status_code == 401
+
+
+async def test_logout_revokes_tokens(client, create_user_in_database, monkeypatch):
+    tokens = await _login_stateless(client, create_user_in_database, monkeypatch)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    resp = client.post(
+        "/login/logout",
+        json={"refresh_token": tokens["refresh_token"]},
+        headers=headers,
+    )
+    assert resp.status_code == 204
+    resp = client.get(f"/user/?user_id={tokens['user_id']}", headers=headers)
+    assert resp.status_code == 401
+    resp = client.post(
+        "/login/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert resp.status_code == 401
+
+
+async def test_delete_revokes_stateless_tokens(
+    client, create_user_in_database, monkeypatch
+):
+    tokens = await _login_stateless(client, create_user_in_database, monkeypatch)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    resp = client.delete(f"/user/?user_id={tokens['user_id']}", headers=headers)
+    assert resp.status_code == 200
+    resp = client.get(f"/user/?user_id={tokens['user_id']}", headers=headers)
+    assert resp.status_code == 401
+    resp = client.post(
+        "/login/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert resp.status_code == 401
+
+
+async def test_delete_revokes_default_tokens(client, create_user_in_database):
+    tokens = await _login(client, create_user_in_database)
+    payload = decode_access_token(tokens["access_token"])
+    assert payload["user_id"] == str(tokens["user_id"])
+    resp = client.delete(
+        f"/user/?user_id={tokens['user_id']}",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert resp.status_code == 200
+    assert await token_revocations.is_revoked(payload)
+
+
+async def test_token_of_deleted_user_does_not_pass_to_new_owner_of_email(
+    client, create_user_in_database
+):
+    tokens = await _login(client, create_user_in_database)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    resp = client.delete(f"/user/?user_id={tokens['user_id']}", headers=headers)
+    assert resp.status_code == 200
+    user_data = {"name": "Petr", "surname": "Petrov", "password": "<PASSWORD>"}
+    resp = client.post("/user/", json={**user_data, "email": "LOL@kek.com"})
+    assert resp.status_code == 200
+    new_user_id = resp.json()["user_id"]
+    # rejected by the user id alone, even once the revocation is forgotten
+    token_revocations.backend.clear()
+    resp = client.get(f"/user/?user_id={new_user_id}", headers=headers)
+    assert resp.status_code == 401
+    # tokens naming only an email are not accepted at all
+    email_only_token = create_access_token(data={"sub": "LOL@kek.com"})
+    resp = client.get(
+        f"/user/?user_id={new_user_id}",
+        headers={"Authorization": f"Bearer {email_only_token}"},
+    )
+    assert resp.status_code == 401
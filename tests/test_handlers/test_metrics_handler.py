@@ -0,0 +1,34 @@
+from uuid import uuid4
+
+from tests.conftest import create_test_auth_headers_for_user
+
+
+async def test_metrics_exposes_route_and_db_metrics(client, create_user_in_database):
+    user_data = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": "<PASSWORD>",
+    }
+    await create_user_in_database(**user_data)
+    resp = client.get(
+        f"/user/?user_id={uuid4()}",
+        headers=create_test_auth_headers_for_user(
+            user_data["email"], user_data["user_id"]
+        ),
+    )
+    assert resp.status_code == 404
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert 'http_requests_total{method="GET",route="/user/",status="404"}' in body
+    assert (
+        'http_request_duration_seconds_bucket{method="GET",route="/user/",le="+Inf"}'
+        in body
+    )
+    assert "# TYPE db_statement_duration_seconds histogram" in body
+    assert 'db_pool_utilization{engine="primary"}' in body
+    assert "# TYPE bcrypt_duration_seconds histogram" in body
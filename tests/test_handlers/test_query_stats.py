@@ -0,0 +1,34 @@
+from uuid import uuid4
+
+import settings
+from tests.conftest import create_test_auth_headers_for_user
+
+
+async def test_debug_headers_report_queries(
+    client, create_user_in_database, monkeypatch
+):
+    monkeypatch.setattr(settings, "DEBUG", True)
+    user_data = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": "<PASSWORD>",
+    }
+    await create_user_in_database(**user_data)
+    resp = client.get(
+        f"/user/?user_id={user_data['user_id']}",
+        headers=create_test_auth_headers_for_user(
+            user_data["email"], user_data["user_id"]
+        ),
+    )
+    assert resp.status_code == 200
+    assert int(resp.headers["x-db-query-count"]) >= 1
+    assert float(resp.headers["x-db-time-ms"]) > 0
+
+
+async def test_no_debug_headers_by_default(client):
+    resp = client.get("/metrics")
+    assert "x-db-query-count" not in resp.headers
+    assert "http_request_db_statements_bucket" in client.get("/metrics").text
@@ -3,6 +3,8 @@ from uuid import uuid4
 
 import pytest
 
+from tests.conftest import create_test_auth_headers_for_user
+
 
 async def test_update_user(client, create_user_in_database, get_user_from_database):
     user_data = {
@@ -267,3 +269,199 @@ async def test_update_user_duplicate_email_error(client, create_user_in_database
     )
     assert resp.status_code == 503
     assert "UniqueViolationError" in resp.json()["detail"]
+
+
+async def test_update_user_returns_user_and_etag(client, create_user_in_database):
+    user_data = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": "<PASSWORD>",
+    }
+    await create_user_in_database(**user_data)
+    headers = create_test_auth_headers_for_user(
+        user_data["email"], user_data["user_id"]
+    )
+    resp = client.patch(
+        f"/user/?user_id={user_data['user_id']}",
+        data=json.dumps({"name": "Ivan"}),
+        headers={**headers, "If-Match": '"1"'},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["etag"] == '"2"'
+    assert resp.json() == {
+        "updated_user_id": str(user_data["user_id"]),
+        "user_id": str(user_data["user_id"]),
+        "name": "Ivan",
+        "surname": user_data["surname"],
+        "email": user_data["email"],
+        "is_active": True,
+    }
+
+
+async def test_update_user_if_match_conflict(
+    client, create_user_in_database, get_user_from_database
+):
+    user_data = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": "<PASSWORD>",
+    }
+    await create_user_in_database(**user_data)
+    headers = create_test_auth_headers_for_user(
+        user_data["email"], user_data["user_id"]
+    )
+    resp = client.patch(
+        f"/user/?user_id={user_data['user_id']}",
+        data=json.dumps({"name": "Ivan"}),
+        headers={**headers, "If-Match": '"5"'},
+    )
+    assert resp.status_code == 412
+    users_from_db = await get_user_from_database(user_data["user_id"])
+    assert dict(users_from_db[0])["name"] == user_data["name"]
+
+    resp = client.patch(
+        f"/user/?user_id={uuid4()}",
+        data=json.dumps({"name": "Ivan"}),
+        headers={**headers, "If-Match": '"1"'},
+    )
+    assert resp.status_code == 404
+
+
+async def test_update_users_batch(
+    client, create_user_in_database, get_user_from_database
+):
+    user_ids = [uuid4(), uuid4()]
+    for index, user_id in enumerate(user_ids):
+        await create_user_in_database(
+            user_id=user_id,
+            name="Nikolai",
+            surname="Sviridov",
+            email=f"lol{index}@kek.com",
+            is_active=True,
+            hashed_password="<PASSWORD>",
+        )
+    missing_user_id = uuid4()
+    resp = client.patch(
+        "/user/batch",
+        json={
+            "users": [
+                {"user_id": str(user_ids[0]), "name": "Ivan"},
+                {"user_id": str(missing_user_id), "name": "Petr"},
+                {"user_id": str(user_ids[1]), "email": "new@kek.com"},
+            ]
+        },
+        headers=create_test_auth_headers_for_user("lol0@kek.com", user_ids[0]),
+    )
+    assert resp.status_code == 200
+    data_from_resp = resp.json()
+    assert data_from_resp["updated"] == 2
+    assert data_from_resp["not_found"] == 1
+    statuses = [result["status"] for result in data_from_resp["results"]]
+    assert statuses == ["updated", "not_found", "updated"]
+    assert data_from_resp["results"][0]["user"]["name"] == "Ivan"
+    assert data_from_resp["results"][0]["user"]["email"] == "lol0@kek.com"
+    users_from_db = await get_user_from_database(user_ids[1])
+    assert users_from_db[0]["name"] == "Nikolai"
+    assert users_from_db[0]["email"] == "new@kek.com"
+    assert users_from_db[0]["version"] == 2
+
+
+async def test_update_users_batch_rejects_repeated_user_id(
+    client, create_user_in_database
+):
+    user_id = uuid4()
+    await create_user_in_database(
+        user_id=user_id,
+        name="Nikolai",
+        surname="Sviridov",
+        email="lol@kek.com",
+        is_active=True,
+        hashed_password="<PASSWORD>",
+    )
+    resp = client.patch(
+        "/user/batch",
+        json={
+            "users": [
+                {"user_id": str(user_id), "name": "Ivan"},
+                {"user_id": str(user_id), "name": "Petr"},
+            ]
+        },
+        headers=create_test_auth_headers_for_user("lol@kek.com", user_id),
+    )
+    assert resp.status_code == 422
+
+
+async def test_update_users_batch_reports_email_conflicts(
+    client, create_user_in_database, get_user_from_database
+):
+    user_ids = [uuid4(), uuid4(), uuid4()]
+    for index, user_id in enumerate(user_ids):
+        await create_user_in_database(
+            user_id=user_id,
+            name="Nikolai",
+            surname="Sviridov",
+            email=f"lol{index}@kek.com",
+            is_active=True,
+            hashed_password="<PASSWORD>",
+        )
+    resp = client.patch(
+        "/user/batch",
+        json={
+            "users": [
+                {"user_id": str(user_ids[0]), "email": "new@kek.com"},
+                {"user_id": str(user_ids[1]), "email": "NEW@kek.com"},
+                {"user_id": str(user_ids[2]), "email": "LOL0@kek.com"},
+            ]
+        },
+        headers=create_test_auth_headers_for_user("lol0@kek.com", user_ids[0]),
+    )
+    assert resp.status_code == 200
+    data_from_resp = resp.json()
+    assert data_from_resp["updated"] == 1
+    assert data_from_resp["conflicts"] == 2
+    assert data_from_resp["not_found"] == 0
+    statuses = [result["status"] for result in data_from_resp["results"]]
+    assert statuses == ["updated", "conflict", "conflict"]
+    users_from_db = await get_user_from_database(user_ids[1])
+    assert users_from_db[0]["email"] == "lol1@kek.com"
+
+
+async def test_update_users_batch_missing_user_claims_no_email(
+    client, create_user_in_database, get_user_from_database
+):
+    user_ids = [uuid4(), uuid4()]
+    for index, user_id in enumerate(user_ids):
+        await create_user_in_database(
+            user_id=user_id,
+            name="Nikolai",
+            surname="Sviridov",
+            email=f"lol{index}@kek.com",
+            is_active=index == 0,
+            hashed_password="<PASSWORD>",
+        )
+    resp = client.patch(
+        "/user/batch",
+        json={
+            "users": [
+                {"user_id": str(uuid4()), "email": "new@kek.com"},
+                {"user_id": str(user_ids[1]), "email": "new@kek.com"},
+                {"user_id": str(user_ids[0]), "email": "NEW@kek.com"},
+            ]
+        },
+        headers=create_test_auth_headers_for_user("lol0@kek.com", user_ids[0]),
+    )
+    assert resp.status_code == 200
+    data_from_resp = resp.json()
+    assert data_from_resp["updated"] == 1
+    assert data_from_resp["not_found"] == 2
+    assert data_from_resp["conflicts"] == 0
+    statuses = [result["status"] for result in data_from_resp["results"]]
+    assert statuses == ["not_found", "not_found", "updated"]
+    users_from_db = await get_user_from_database(user_ids[0])
+    assert users_from_db[0]["email"] == "NEW@kek.com"
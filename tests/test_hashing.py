@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.hash import bcrypt
+
+from hashing import _get_password_hash
+from hashing import _verify_password
+from hashing import calibrate_bcrypt_rounds
+from hashing import Hasher
+from hashing import HasherBusyError
+from hashing import HashingPool
+
+
+async def test_hashing_pool_rejects_when_saturated():
+    pool = HashingPool("thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+    jobs = [asyncio.create_task(pool.run("hash", release.wait)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(HasherBusyError):
+        await pool.run("hash", release.wait)
+    release.set()
+    assert await asyncio.gather(*jobs) == [True, True]
+    assert await pool.run("hash", release.wait) is True
+    pool.shutdown()
+
+
+async def test_hashing_pool_hash_and_verify():
+    pool = HashingPool("thread", max_workers=2, max_queue=0)
+    hashed = await pool.run("hash", _get_password_hash, "secret")
+    assert await pool.run("verify", _verify_password, "secret", hashed) is True
+    assert await pool.run("verify", _verify_password, "wrong", hashed) is False
+    pool.shutdown()
+
+
+def test_calibrate_bcrypt_rounds_stays_in_bounds():
+    assert calibrate_bcrypt_rounds(0, min_rounds=4, max_rounds=6) == 4
+    assert calibrate_bcrypt_rounds(60, min_rounds=4, max_rounds=6) == 6
+
+
+def test_hasher_needs_update_for_other_cost():
+    assert Hasher.needs_update(bcrypt.using(rounds=4).hash("secret"))
+    assert not Hasher.needs_update(Hasher.get_password_hash("secret"))
+
+
+async def test_hashing_pool_admits_batches_per_chunk():
+    pool = HashingPool("thread", max_workers=2, max_queue=1)
+    batch = [("a",), ("b",), ("c",), ("d",)]
+    assert await pool.map("hash", str.upper, batch) == ["A", "B", "C", "D"]
+    release = threading.Event()
+    jobs = [asyncio.create_task(pool.run("hash", release.wait)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(HasherBusyError):
+        await pool.map("hash", str.upper, [("a",), ("b",)])
+    release.set()
+    await asyncio.gather(*jobs)
+    pool.shutdown()
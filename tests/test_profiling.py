@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+import settings
+from api.middleware import ProfilingMiddleware
+
+
+def _busy_loop():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        _busy_loop()
+        await asyncio.sleep(0.05)
+        return {}
+
+    app.add_middleware(ProfilingMiddleware)
+    return app
+
+
+def test_profiling_requires_token(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(settings, "PROFILING_OUTPUT_DIR", str(tmp_path))
+    client = TestClient(_make_app())
+    resp = client.get("/slow", headers={"X-Profile-Token": "wrong"})
+    assert resp.status_code == 200
+    assert "x-profile-id" not in resp.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profiling_writes_folded_stacks(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(settings, "PROFILING_OUTPUT_DIR", str(tmp_path))
+    client = TestClient(_make_app())
+    resp = client.get("/slow", headers={"X-Profile-Token": "secret"})
+    assert resp.status_code == 200
+    profile = (tmp_path / f"{resp.headers['x-profile-id']}.folded").read_text()
+    assert "_busy_loop" in profile
+    assert "<awaiting>" in profile
@@ -0,0 +1,37 @@
+from ratelimit import LOGIN_RATE_LIMITED
+from ratelimit import LoginRateLimiter
+from ratelimit import MemoryBackend
+
+
+async def test_memory_backend_token_bucket():
+    backend = MemoryBackend(max_keys=10)
+    assert await backend.take("key", capacity=2, rate=1) == 0
+    assert await backend.take("key", capacity=2, rate=1) == 0
+    retry_after = await backend.take("key", capacity=2, rate=1)
+    assert 0 < retry_after <= 1
+    assert await backend.take("other", capacity=2, rate=1) == 0
+
+
+async def test_memory_backend_bounds_keys():
+    backend = MemoryBackend(max_keys=2)
+    for key in ("a", "b", "c"):
+        await backend.take(key, capacity=1, rate=1)
+    assert len(backend._buckets) == 2
+    # "a" was evicted, so it starts with a full bucket again
+    assert await backend.take("a", capacity=1, rate=1) == 0
+
+
+async def test_login_rate_limiter_limits_by_email_and_ip():
+    limiter = LoginRateLimiter(
+        MemoryBackend(max_keys=100),
+        email_burst=1,
+        email_per_minute=1,
+        ip_burst=2,
+        ip_per_minute=1,
+    )
+    rejected_by_ip = LOGIN_RATE_LIMITED.labels("ip").value
+    assert await limiter.check("lol@kek.com", "10.0.0.1") == 0
+    assert await limiter.check("LOL@kek.com", "10.0.0.2") > 0
+    assert await limiter.check("other@kek.com", "10.0.0.1") == 0
+    assert await limiter.check("third@kek.com", "10.0.0.1") > 0
+    assert LOGIN_RATE_LIMITED.labels("ip").value == rejected_by_ip + 1
@@ -0,0 +1,46 @@
+import time
+
+from revocation import _digest
+from revocation import BloomFilter
+from revocation import MemoryBackend
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [_digest(str(i)) for i in range(1000)]
+    for key in keys[::2]:
+        bloom.add(key)
+    assert all(key in bloom for key in keys[::2])
+    false_positives = sum(key in bloom for key in keys[1::2])
+    assert false_positives < 50
+
+
+async def test_memory_backend_revokes_until_exp():
+    backend = MemoryBackend(capacity=100, error_rate=0.01)
+    now = time.time()
+    await backend.revoke("live", now + 60)
+    await backend.revoke("expired", now - 1)
+    assert await backend.is_revoked("live", None, now)
+    assert not await backend.is_revoked("expired", None, now)
+    assert not await backend.is_revoked("other", None, now)
+
+
+async def test_memory_backend_revokes_subject_tokens_issued_before():
+    backend = MemoryBackend(capacity=100, error_rate=0.01)
+    now = time.time()
+    await backend.revoke_subject("user", now, ttl=60)
+    assert await backend.is_revoked(None, "user", now - 10)
+    assert not await backend.is_revoked(None, "user", now + 10)
+    assert not await backend.is_revoked(None, "other", now - 10)
+
+
+async def test_memory_backend_prunes_expired_entries():
+    backend = MemoryBackend(capacity=100, error_rate=0.01)
+    now = time.time()
+    await backend.revoke("short", now + 0.01)
+    await backend.revoke("long", now + 60)
+    time.sleep(0.02)
+    backend.prune_interval = 0
+    await backend.revoke("new", now + 60)
+    assert len(backend._tokens) == 2
+    assert await backend.is_revoked("long", None, now)
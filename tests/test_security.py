@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+import pytest
+from jose import JWTError
+
+from security import create_access_token
+from security import decode_access_token
+from security import token_cache
+
+
+def test_decode_access_token_is_cached():
+    token = create_access_token({"sub": "lol@kek.com"}, timedelta(minutes=5))
+    hits = token_cache.hits
+    assert decode_access_token(token)["sub"] == "lol@kek.com"
+    assert decode_access_token(token)["sub"] == "lol@kek.com"
+    assert token_cache.hits == hits + 1
+
+
+def test_decode_access_token_invalid_is_not_cached():
+    size = len(token_cache)
+    with pytest.raises(JWTError):
+        decode_access_token("not-a-token")
+    assert len(token_cache) == size
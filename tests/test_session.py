@@ -0,0 +1,76 @@
+import logging
+
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import settings
+from db import session as db_session
+from db.models import User
+from db.session import create_engine
+from db.session import query_stats
+from db.session import QueryStats
+from db.session import recent_writers
+from db.session import ReplicaSet
+from db.session import RoutingSession
+
+
+def _routing_session(monkeypatch):
+    primary = create_async_engine(settings.TEST_DATABASE_URL)
+    replica = create_async_engine(settings.TEST_DATABASE_URL)
+    monkeypatch.setattr(db_session, "replica_set", ReplicaSet([replica], 30))
+    session = AsyncSession(primary, sync_session_class=RoutingSession)
+    return session.sync_session, primary.sync_engine, replica.sync_engine
+
+
+def test_routing_session_reads_from_replica_until_write(monkeypatch):
+    session, primary, replica = _routing_session(monkeypatch)
+    read = select(User).execution_options(read_replica=True)
+    assert session.get_bind(clause=read) is replica
+    assert session.get_bind(clause=select(User)) is primary
+    assert session.get_bind(clause=update(User).values(name="Ivan")) is primary
+    assert session.get_bind(clause=read) is primary
+
+
+def test_routing_session_read_your_writes_for_principal(monkeypatch):
+    writer, primary, _ = _routing_session(monkeypatch)
+    writer.info["principal"] = "lol@kek.com"
+    writer.get_bind(clause=update(User).values(name="Ivan"))
+
+    reader, primary, replica = _routing_session(monkeypatch)
+    read = select(User).execution_options(read_replica=True)
+    reader.info["principal"] = "lol@kek.com"
+    assert reader.get_bind(clause=read) is primary
+    reader.info["principal"] = "other@kek.com"
+    assert reader.get_bind(clause=read) is replica
+    recent_writers.clear()
+
+
+def test_routing_session_skips_unavailable_replica(monkeypatch):
+    session, primary, _ = _routing_session(monkeypatch)
+    db_session.replica_set.mark_down(0)
+    read = select(User).execution_options(read_replica=True)
+    assert session.get_bind(clause=read) is primary
+
+
+async def test_engine_counts_statements_and_logs_slow_ones(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_SECONDS", 0)
+    engine = create_engine(settings.TEST_DATABASE_URL, name="test")
+    stats = QueryStats()
+    token = query_stats.set(stats)
+    try:
+        with caplog.at_level(logging.WARNING, logger="db.session"):
+            async with engine.connect() as connection:
+                await connection.execute(
+                    text("SELECT :email"), {"email": "secret@kek.com"}
+                )
+                await connection.execute(text("SELECT 1"))
+    finally:
+        query_stats.reset(token)
+        await engine.dispose()
+    assert stats.count >= 2
+    assert stats.duration > 0
+    assert "Slow query on test" in caplog.text
+    assert "secret@kek.com" not in caplog.text
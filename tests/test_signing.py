@@ -0,0 +1,51 @@
+import pytest
+import rsa
+from jose import JWTError
+
+from signing import create_signer
+from signing import load_keys
+
+
+def test_hmac_signer_rotates_keys():
+    old = create_signer("jose", "HS256", {"old": b"old-secret"}, "old")
+    rotated = create_signer(
+        "jose", "HS256", {"old": b"old-secret", "new": b"new-secret"}, "new"
+    )
+    token = old.encode({"sub": "lol@kek.com"})
+    assert rotated.decode(token)["sub"] == "lol@kek.com"
+    new_token = rotated.encode({"sub": "lol@kek.com"})
+    with pytest.raises(JWTError):
+        old.decode(new_token)
+    assert rotated.jwks() == {"keys": []}
+
+
+def test_rs256_signer_publishes_jwks(tmp_path):
+    _, private_key = rsa.newkeys(1024)
+    (tmp_path / "2024-01.pem").write_bytes(private_key.save_pkcs1())
+    keys = load_keys(str(tmp_path), "unused", "2024-01")
+    signer = create_signer("jose", "RS256", keys, "2024-01")
+    token = signer.encode({"sub": "lol@kek.com"})
+    assert signer.decode(token)["sub"] == "lol@kek.com"
+    (jwk,) = signer.jwks()["keys"]
+    assert jwk["kid"] == "2024-01"
+    assert jwk["kty"] == "RSA"
+    assert "d" not in jwk
+
+
+def test_pyjwt_signer_supports_eddsa():
+    pytest.importorskip("jwt")
+    serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+    ed25519 = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.ed25519")
+    pem = ed25519.Ed25519PrivateKey.generate().private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    signer = create_signer("pyjwt", "EdDSA", {"ed": pem}, "ed")
+    token = signer.encode({"sub": "lol@kek.com"})
+    assert signer.decode(token)["sub"] == "lol@kek.com"
+    with pytest.raises(JWTError):
+        signer.decode(token + "x")
+    (jwk,) = signer.jwks()["keys"]
+    assert jwk["kty"] == "OKP"
+    assert "d" not in jwk
@@ -0,0 +1,127 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import inspect
+
+from db.dals import UserDAL
+from singleflight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test_shared")
+    calls = []
+
+    async def lookup(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    results = await asyncio.gather(
+        *(flight.do("a", lookup, "a") for _ in range(5)), flight.do("b", lookup, "b")
+    )
+    assert results == ["A"] * 5 + ["B"]
+    assert calls == ["a", "b"]
+    assert flight._coalesced.value == 4
+    # nothing is kept once the call is done
+    assert await flight.do("a", lookup, "a") == "A"
+    assert calls == ["a", "b", "a"]
+
+
+async def test_errors_reach_every_waiter():
+    flight = SingleFlight("test_errors")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *(flight.do("key", failing) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight._in_flight == {}
+
+
+async def test_cancelled_waiter_does_not_cancel_the_call():
+    flight = SingleFlight("test_cancel")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return 1
+
+    leader = asyncio.create_task(flight.do("key", slow))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(flight.do("key", slow))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert await leader == 1
+
+
+async def test_cancelled_caller_does_not_cancel_the_waiters():
+    flight = SingleFlight("test_cancel_leader")
+    calls = []
+
+    async def slow(caller):
+        calls.append(caller)
+        await asyncio.sleep(0.02)
+        return caller
+
+    leader = asyncio.create_task(flight.do("key", slow, "leader"))
+    await asyncio.sleep(0)
+    waiters = [
+        asyncio.create_task(flight.do("key", slow, f"waiter{i}")) for i in range(2)
+    ]
+    await asyncio.sleep(0)
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    # the waiters run the call again, once, with the arguments of the first one
+    assert await asyncio.gather(*waiters) == ["waiter0", "waiter0"]
+    assert calls == ["leader", "waiter0"]
+    assert flight._in_flight == {}
+
+
+async def test_user_lookup_survives_a_cancelled_first_caller(
+    async_session_test, create_user_in_database
+):
+    user_id = uuid4()
+    await create_user_in_database(
+        user_id=user_id,
+        name="Nikolai",
+        surname="Sviridov",
+        email="lol@kek.com",
+        is_active=True,
+        hashed_password="<PASSWORD>",
+    )
+    async with async_session_test() as first, async_session_test() as second:
+        leader = asyncio.create_task(UserDAL(first).get_user(user_id))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(UserDAL(second).get_user(user_id))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert (await waiter).user_id == user_id
+
+
+async def test_user_lookups_share_a_user_bound_to_no_session(
+    async_session_test, create_user_in_database
+):
+    user_id = uuid4()
+    await create_user_in_database(
+        user_id=user_id,
+        name="Nikolai",
+        surname="Sviridov",
+        email="lol@kek.com",
+        is_active=True,
+        hashed_password="<PASSWORD>",
+    )
+    async with async_session_test() as first, async_session_test() as second:
+        users = await asyncio.gather(
+            UserDAL(first).get_user(user_id), UserDAL(second).get_user(user_id)
+        )
+    assert users[0] is users[1]
+    assert inspect(users[0]).transient
+    assert users[0].email == "lol@kek.com"
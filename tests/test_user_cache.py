@@ -0,0 +1,203 @@
+import asyncio
+import time
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import settings
+from db.dals import UserDAL
+from db.models import User
+from db.session import create_engine
+from db.session import replica_set
+from db.session import RoutingSession
+from db.user_cache import MemoryBackend
+from db.user_cache import MISSING
+from db.user_cache import NOT_CACHED
+from db.user_cache import RedisBackend
+from db.user_cache import user_cache
+from db.user_cache import UserCache
+
+
+class LocalRedis:
+    """Stand-in for a redis client: GET, MGET, SET with EX and NX and DEL over
+    a dict"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        value, expires_at = self.data.get(key, (None, 0))
+        return value if expires_at > time.monotonic() else None
+
+    async def mget(self, *keys):
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key, value, ex, nx=False):
+        if nx and await self.get(key) is not None:
+            return
+        self.data[key] = (value.encode(), time.monotonic() + ex)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def _user(**kwargs) -> User:
+    fields = {
+        "user_id": uuid4(),
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "is_active": True,
+        "hashed_password": "<PASSWORD>",
+        "version": 1,
+        **kwargs,
+    }
+    return User(**fields)
+
+
+async def _check_cache(cache: UserCache):
+    user = _user()
+    assert await cache.get_by_id(user.user_id) is NOT_CACHED
+    await cache.set_user(user, await cache.id_generation(user.user_id))
+    cached = await cache.get_by_id(user.user_id)
+    assert (cached.user_id, cached.email, cached.version) == (
+        user.user_id,
+        "lol@kek.com",
+        1,
+    )
+    assert cached.hashed_password is None
+    assert (await cache.get_by_email("lol@kek.com")).user_id == user.user_id
+
+    # the email pointer is ignored once the row under the id has another email
+    await cache.set_user(
+        _user(user_id=user.user_id, email="new@kek.com"),
+        await cache.id_generation(user.user_id),
+    )
+    assert await cache.get_by_email("lol@kek.com") is NOT_CACHED
+
+    await cache.invalidate([user.user_id])
+    assert await cache.get_by_id(user.user_id) is NOT_CACHED
+    assert await cache.get_by_email("new@kek.com") is NOT_CACHED
+
+    generation = await cache.email_generation("nobody@kek.com")
+    await cache.set_missing_email("nobody@kek.com", generation)
+    assert await cache.get_by_email("nobody@kek.com") == MISSING
+    await cache.invalidate(emails=["nobody@kek.com"])
+    assert await cache.get_by_email("nobody@kek.com") is NOT_CACHED
+
+    # a fill read before an invalidation is never served, even if it lands after
+    generation = await cache.id_generation(user.user_id)
+    await cache.invalidate([user.user_id])
+    await cache.set_user(user, generation)
+    assert await cache.get_by_id(user.user_id) is NOT_CACHED
+
+
+async def test_user_cache_memory_backend():
+    await _check_cache(
+        UserCache(MemoryBackend(100, 60), ttl=60, negative_ttl=5, jitter=0.1)
+    )
+
+
+async def test_user_cache_redis_backend():
+    redis = LocalRedis()
+    await _check_cache(
+        UserCache(RedisBackend(redis, 60), ttl=60, negative_ttl=5, jitter=0.1)
+    )
+    assert all(key.startswith("user:") for key in redis.data)
+
+
+async def test_user_cache_ttl_jitter():
+    cache = UserCache(MemoryBackend(100, 60), ttl=60, negative_ttl=5, jitter=0.5)
+    ttls = {cache._jittered(60) for _ in range(20)}
+    assert all(30 <= ttl <= 60 for ttl in ttls)
+    assert len(ttls) > 1
+
+
+def _routing_session_factory() -> async_sessionmaker:
+    return async_sessionmaker(
+        create_engine(settings.TEST_DATABASE_URL, name="test"),
+        sync_session_class=RoutingSession,
+    )
+
+
+async def test_user_cache_is_filled_from_the_primary(
+    create_user_in_database, monkeypatch
+):
+    user_id = uuid4()
+    await create_user_in_database(
+        user_id=user_id,
+        name="Nikolai",
+        surname="Sviridov",
+        email="lol@kek.com",
+        is_active=True,
+        hashed_password="<PASSWORD>",
+    )
+    replica_reads = []
+    monkeypatch.setattr(replica_set, "choose", lambda: replica_reads.append(1))
+    session_factory = _routing_session_factory()
+    async with session_factory() as session:
+        assert (await UserDAL(session).get_user(user_id)).user_id == user_id
+    assert replica_reads == []
+    assert (await user_cache.get_by_id(user_id)).user_id == user_id
+    # without a cache to fill, lookups go to a replica
+    monkeypatch.setattr(user_cache, "backend", None)
+    async with session_factory() as session:
+        assert (await UserDAL(session).get_user(user_id)).user_id == user_id
+    assert replica_reads == [1]
+
+
+async def test_login_lookup_reads_the_primary(create_user_in_database, monkeypatch):
+    user_id = uuid4()
+    await create_user_in_database(
+        user_id=user_id,
+        name="Nikolai",
+        surname="Sviridov",
+        email="lol@kek.com",
+        is_active=True,
+        hashed_password="<PASSWORD>",
+    )
+    replica_reads = []
+    monkeypatch.setattr(replica_set, "choose", lambda: replica_reads.append(1))
+    monkeypatch.setattr(user_cache, "backend", None)
+    async with _routing_session_factory()() as session:
+        dal = UserDAL(session)
+        user = await dal.get_user_by_email("LOL@kek.com", with_password=True)
+        assert user.user_id == user_id
+        assert await dal.get_user_by_email("nobody@kek.com", with_password=True) is None
+    assert replica_reads == []
+
+
+async def test_user_cache_drops_a_read_that_raced_a_write(
+    create_user_in_database, monkeypatch
+):
+    user_id = uuid4()
+    await create_user_in_database(
+        user_id=user_id,
+        name="Nikolai",
+        surname="Sviridov",
+        email="lol@kek.com",
+        is_active=True,
+        hashed_password="<PASSWORD>",
+    )
+    session_factory = _routing_session_factory()
+    get_user = UserDAL._get_user
+
+    async def get_user_then_write(self, *args, **kwargs):
+        # the write commits between the read and the cache fill
+        user = await get_user(self, *args, **kwargs)
+        async with session_factory() as session:
+            async with session.begin():
+                await UserDAL(session).update_user(user_id, name="Ivan")
+        await asyncio.sleep(0)
+        return user
+
+    monkeypatch.setattr(UserDAL, "_get_user", get_user_then_write)
+    async with session_factory() as session:
+        assert (await UserDAL(session).get_user(user_id)).name == "Nikolai"
+    assert await user_cache.get_by_id(user_id) is NOT_CACHED
+
+    monkeypatch.setattr(UserDAL, "_get_user", get_user)
+    async with session_factory() as session:
+        assert (await UserDAL(session).get_user(user_id)).name == "Ivan"
+    assert (await user_cache.get_by_id(user_id)).name == "Ivan"